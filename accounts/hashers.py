@@ -0,0 +1,23 @@
+"""
+Django's scrypt and Argon2 hashers with their cost parameters taken from
+settings. The algorithm names are unchanged, so hashes stay readable by the
+stock hashers, and must_update() re-hashes a password at its next login
+whenever the configured cost changes.
+"""
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class ScryptPasswordHasher(hashers.ScryptPasswordHasher):
+    work_factor = getattr(settings, "PASSWORD_SCRYPT_WORK_FACTOR", 2**14)
+    block_size = getattr(settings, "PASSWORD_SCRYPT_BLOCK_SIZE", 8)
+    parallelism = getattr(settings, "PASSWORD_SCRYPT_PARALLELISM", 1)
+    # OpenSSL's default 32 MiB cap is too small beyond work_factor 2**14
+    maxmem = 2 * 128 * work_factor * block_size
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    time_cost = getattr(settings, "PASSWORD_ARGON2_TIME_COST", 2)
+    memory_cost = getattr(settings, "PASSWORD_ARGON2_MEMORY_COST", 102400)
+    parallelism = getattr(settings, "PASSWORD_ARGON2_PARALLELISM", 8)
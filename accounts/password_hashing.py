@@ -0,0 +1,99 @@
+"""
+Password hashing off the request thread.
+
+With PASSWORD_HASHING_STRATEGY = "pool" (the default) make_password runs in
+a small per-process ProcessPoolExecutor, so a burst of sign-ups costs at most
+PASSWORD_HASHING_WORKERS cores per web process and never holds the GIL the
+request threads need. At most PASSWORD_HASHING_MAX_PENDING hashes may be
+queued or running; beyond that HashingBusy (503) is raised rather than
+letting requests pile up behind the pool. "inline" hashes in the caller.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+_pool_lock = threading.Lock()
+_pool = None
+_slots = None
+
+
+class HashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Too many sign-ups in progress, retry shortly."
+    default_code = "hashing_busy"
+
+
+def _inline() -> bool:
+    return getattr(settings, "PASSWORD_HASHING_STRATEGY", "pool") == "inline"
+
+
+def _get_pool():
+    global _pool, _slots
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _slots = threading.BoundedSemaphore(
+                    getattr(settings, "PASSWORD_HASHING_MAX_PENDING", 64)
+                )
+                # forkserver: workers never inherit the web process's
+                # threads or open sockets; settings load from the environment
+                _pool = ProcessPoolExecutor(
+                    max_workers=getattr(settings, "PASSWORD_HASHING_WORKERS", 2),
+                    mp_context=multiprocessing.get_context("forkserver"),
+                )
+    return _pool, _slots
+
+
+def _submit(raw_password):
+    pool, slots = _get_pool()
+    if not slots.acquire(blocking=False):
+        raise HashingBusy()
+    try:
+        future = pool.submit(make_password, raw_password)
+    except BrokenProcessPool:
+        slots.release()
+        _reset_pool()
+        raise
+    future.add_done_callback(lambda _: slots.release())
+    return future
+
+
+def hash_password(raw_password: str) -> str:
+    if _inline():
+        return make_password(raw_password)
+    try:
+        return _submit(raw_password).result()
+    except BrokenProcessPool:
+        # a worker died (e.g. OOM-killed); the next call builds a new pool
+        _reset_pool()
+        return make_password(raw_password)
+
+
+async def ahash_password(raw_password: str) -> str:
+    if _inline():
+        return await sync_to_async(make_password)(raw_password)
+    try:
+        return await asyncio.wrap_future(_submit(raw_password))
+    except BrokenProcessPool:
+        _reset_pool()
+        return await sync_to_async(make_password)(raw_password)
+
+
+def _reset_pool():
+    global _pool, _pool_lock
+    _pool = None
+    _pool_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_pool)
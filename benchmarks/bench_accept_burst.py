@@ -0,0 +1,96 @@
+"""
+Invitation accept throughput under a burst of concurrent accepts, and what
+the burst does to the latency of an unrelated cheap endpoint on the same
+server. Start the server once per hashing strategy and compare:
+
+    PASSWORD_HASHING_STRATEGY=inline uvicorn multi_tenant_system.asgi:application --port 8000
+    python -m benchmarks.bench_accept_burst --tenant 1 --burst 200
+
+    PASSWORD_HASHING_STRATEGY=pool uvicorn multi_tenant_system.asgi:application --port 8000
+    python -m benchmarks.bench_accept_burst --tenant 1 --burst 200
+
+The script creates the pending invitations directly in the database the
+server uses (same settings), so run it with the server's environment.
+"""
+
+import argparse
+import json
+import os
+import threading
+import uuid
+
+import django
+
+from benchmarks.loadgen import percentile, print_table, run_load
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--tenant", default="1")
+    parser.add_argument("--burst", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument(
+        "--path",
+        default="/api/invitations/accept/",
+        help="accept endpoint, e.g. /api/async/invitations/accept/",
+    )
+    args = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "multi_tenant_system.settings")
+    django.setup()
+    from invitations.models import Invitation
+
+    run_id = uuid.uuid4().hex[:8]
+    expiry = Invitation.default_expiry()
+    invites = Invitation.objects.bulk_create(
+        Invitation(
+            tenant_id=args.tenant,
+            name=f"burst{i}",
+            email=f"burst-{run_id}-{i}@example.com",
+            token=Invitation.generate_token(),
+            expiration_date=expiry,
+        )
+        for i in range(args.burst)
+    )
+    bodies = [
+        json.dumps({"token": invite.token, "password": f"Burst-{run_id}-pw"}).encode()
+        for invite in invites
+    ]
+
+    probe_ms = []
+    done = threading.Event()
+
+    def probe_dashboard():
+        # one cheap request at a time for as long as the burst runs
+        while not done.is_set():
+            result = run_load(
+                args.base_url + "/api/dashboard/",
+                concurrency=1,
+                total=1,
+                headers={"X-Tenant-ID": args.tenant},
+            )
+            probe_ms.append(result["mean_ms"])
+
+    prober = threading.Thread(target=probe_dashboard)
+    prober.start()
+    accept = run_load(
+        args.base_url + args.path,
+        method="POST",
+        concurrency=args.concurrency,
+        total=args.burst,
+        headers={"Content-Type": "application/json"},
+        body_factory=lambda i: bodies[i],
+    )
+    done.set()
+    prober.join()
+
+    print_table([("accept", accept)])
+    print(
+        f"dashboard during burst: {len(probe_ms)} requests, "
+        f"p50 {percentile(probe_ms, 50):.2f} ms, p99 {percentile(probe_ms, 99):.2f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Compare the sync (DRF) and async (plain Django) dashboard stacks under
+concurrent load, served through the ASGI entry point.
+
+    uvicorn multi_tenant_system.asgi:application --port 8000 --workers 1
+    python -m benchmarks.bench_async_views --tenant 1 --concurrency 200
+
+Run the server with a single worker so both stacks get the same CPU budget;
+the interesting figure is how p99 grows with concurrency.
+"""
+
+import argparse
+
+from benchmarks.loadgen import print_table, run_load
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--tenant", default="1")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--total", type=int, default=5000)
+    args = parser.parse_args()
+
+    headers = {"X-Tenant-ID": args.tenant}
+    rows = []
+    for name, path in (("sync", "/api/dashboard/"), ("async", "/api/async/dashboard/")):
+        # warm the permission index and membership cache
+        run_load(args.base_url + path, concurrency=1, total=20, headers=headers)
+        rows.append(
+            (
+                name,
+                run_load(
+                    args.base_url + path,
+                    concurrency=args.concurrency,
+                    total=args.total,
+                    headers=headers,
+                ),
+            )
+        )
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
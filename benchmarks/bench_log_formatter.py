@@ -0,0 +1,80 @@
+"""
+Records per second through python-json-logger's JsonFormatter (the format
+string LOGGING used before) and invitations.log_format.JsonFormatter, on the
+records a request typically produces: a plain info line with the request
+context, one with `extra` fields, and an error with a traceback. Also checks
+that both produce the same bytes.
+
+    python -m benchmarks.bench_log_formatter --records 200000
+"""
+
+import argparse
+import copy
+import logging
+import sys
+import time
+
+from pythonjsonlogger.jsonlogger import JsonFormatter as LegacyJsonFormatter
+
+from invitations.log_format import JsonFormatter
+
+LEGACY_FORMAT = (
+    "%(asctime)s %(levelname)s %(name)s %(message)s "
+    "%(service)s %(trace_id)s %(user_id)s %(tenant_id)s"
+)
+
+
+def _record(msg, args=(), level=logging.INFO, exc_info=None, **extra):
+    record = logging.LogRecord(
+        "invitations.views", level, __file__, 1, msg, args, exc_info
+    )
+    record.__dict__.update(
+        service="multi-tenant-system",
+        trace_id="4bf92f3577b34da6a3ce929d0e0e4736",
+        user_id=42,
+        tenant_id=7,
+    )
+    record.__dict__.update(extra)
+    return record
+
+
+def _samples():
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        exc_info = sys.exc_info()
+    return {
+        "plain": _record("Invitation created"),
+        "extra": _record(
+            "Invitation %s accepted", (1234,), status_code=200, path="/api/x/"
+        ),
+        "error": _record("Send failed", level=logging.ERROR, exc_info=exc_info),
+    }
+
+
+def _rate(formatter, record, count: int) -> float:
+    records = [copy.copy(record) for _ in range(count)]
+    started = time.perf_counter()
+    for item in records:
+        formatter.format(item)
+    return count / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=100_000)
+    args = parser.parse_args()
+
+    legacy = LegacyJsonFormatter(LEGACY_FORMAT)
+    fast = JsonFormatter()
+
+    print(f"{'record':<10}{'legacy/s':>12}{'fast/s':>12}{'speedup':>10}  same")
+    for name, record in _samples().items():
+        same = legacy.format(copy.copy(record)) == fast.format(copy.copy(record))
+        old = _rate(legacy, record, args.records)
+        new = _rate(fast, record, args.records)
+        print(f"{name:<10}{old:>12.0f}{new:>12.0f}{new / old:>9.1f}x  {same}")
+
+
+if __name__ == "__main__":
+    main()
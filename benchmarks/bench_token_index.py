@@ -0,0 +1,109 @@
+"""
+Index size and lookup latency of the old token scheme (128-char text with a
+unique constraint plus a separate B-tree) against the 32-byte digest with a
+single hash index, on scratch tables in the configured PostgreSQL database.
+
+    python -m benchmarks.bench_token_index --rows 5000000 --lookups 20000
+
+The scratch tables are dropped afterwards. Building them takes a while at
+millions of rows; run against a disposable database.
+"""
+
+import argparse
+import hashlib
+import os
+import random
+import secrets
+import time
+
+import django
+
+from benchmarks.loadgen import percentile
+
+SCHEMES = {
+    "text+btree": (
+        "bench_token_text",
+        "token varchar(128) NOT NULL UNIQUE",
+        "CREATE INDEX bench_token_text_idx ON bench_token_text (token)",
+        "token",
+    ),
+    "digest+hash": (
+        "bench_token_digest",
+        "token_digest bytea NOT NULL",
+        "CREATE INDEX bench_token_digest_idx ON bench_token_digest "
+        "USING hash (token_digest)",
+        "token_digest",
+    ),
+}
+
+
+def _token(i: int, seed: str) -> str:
+    # deterministic token_urlsafe(32)-shaped values, so lookups can be
+    # regenerated without keeping millions of tokens in memory
+    return hashlib.sha256(f"{seed}:{i}".encode()).hexdigest()[:43]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--lookups", type=int, default=10_000)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "multi_tenant_system.settings")
+    django.setup()
+    from django.db import connection
+
+    seed = secrets.token_hex(4)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "CREATE TEMP TABLE bench_token_src AS SELECT i, "
+            "left(encode(sha256(convert_to(%s || ':' || i, 'UTF8')), 'hex'), 43) "
+            "AS token FROM generate_series(0, %s) AS i",
+            [seed, args.rows - 1],
+        )
+        print(f"{'scheme':<14}{'index MB':>10}{'p50 us':>10}{'p99 us':>10}")
+        for name, (table, column, index_sql, lookup) in SCHEMES.items():
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+            cursor.execute(f"CREATE TABLE {table} (id bigserial PRIMARY KEY, {column})")
+            if lookup == "token":
+                cursor.execute(
+                    f"INSERT INTO {table} (token) SELECT token FROM bench_token_src"
+                )
+            else:
+                cursor.execute(
+                    f"INSERT INTO {table} (token_digest) "
+                    "SELECT sha256(convert_to(token, 'UTF8')) FROM bench_token_src"
+                )
+            cursor.execute(index_sql)
+            cursor.execute(f"VACUUM ANALYZE {table}")
+            cursor.execute(
+                "SELECT coalesce(sum(pg_relation_size(indexrelid)), 0) "
+                "FROM pg_index WHERE indrelid = %s::regclass "
+                "AND NOT indisprimary",
+                [table],
+            )
+            index_mb = cursor.fetchone()[0] / 1024 / 1024
+
+            sql = f"SELECT id FROM {table} WHERE {lookup} = %s"
+            latencies = []
+            for _ in range(args.lookups):
+                token = _token(random.randrange(args.rows), seed)
+                key = (
+                    token
+                    if lookup == "token"
+                    else hashlib.sha256(token.encode()).digest()
+                )
+                started = time.perf_counter()
+                cursor.execute(sql, [key])
+                cursor.fetchone()
+                latencies.append((time.perf_counter() - started) * 1_000_000)
+
+            print(
+                f"{name:<14}{index_mb:>10.1f}{percentile(latencies, 50):>10.1f}"
+                f"{percentile(latencies, 99):>10.1f}"
+            )
+            cursor.execute(f"DROP TABLE {table}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Minimal closed-loop HTTP load generator shared by the benchmark scripts.
+
+Each of `concurrency` threads keeps one request in flight until `total`
+requests have been sent. Only the standard library is used so the scripts
+run anywhere the app runs.
+"""
+
+import http.client
+import statistics
+import threading
+import time
+from urllib.parse import urlparse
+
+
+def percentile(samples, pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    k = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def run_load(
+    url: str,
+    *,
+    concurrency: int = 50,
+    total: int = 2000,
+    method: str = "GET",
+    headers=None,
+    body_factory=None,
+) -> dict:
+    """
+    Drive `url` and return throughput and latency figures (latencies in ms).
+    `body_factory(i)` may return a bytes body for the i-th request.
+    """
+    parsed = urlparse(url)
+    path = parsed.path + (f"?{parsed.query}" if parsed.query else "")
+    latencies = []
+    statuses = {}
+    counter = iter(range(total))
+    lock = threading.Lock()
+
+    def worker():
+        conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80)
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                break
+            body = body_factory(i) if body_factory else None
+            started = time.perf_counter()
+            try:
+                conn.request(method, path, body=body, headers=headers or {})
+                response = conn.getresponse()
+                response.read()
+                code = response.status
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80)
+                code = "error"
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                latencies.append(elapsed)
+                statuses[code] = statuses.get(code, 0) + 1
+        conn.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / wall if wall else 0.0,
+        "p50_ms": percentile(latencies, 50),
+        "p99_ms": percentile(latencies, 99),
+        "mean_ms": statistics.fmean(latencies) if latencies else 0.0,
+        "statuses": statuses,
+    }
+
+
+def print_table(rows):
+    print(f"{'stack':<12}{'rps':>10}{'p50 ms':>10}{'p99 ms':>10}  statuses")
+    for name, result in rows:
+        print(
+            f"{name:<12}{result['rps']:>10.1f}{result['p50_ms']:>10.2f}"
+            f"{result['p99_ms']:>10.2f}  {result['statuses']}"
+        )
@@ -0,0 +1,44 @@
+"""
+Local HTTP/1.1 keep-alive stub server for outbound-client benchmarks.
+"""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # buffer headers and body into one segment; unbuffered writes hit
+    # Nagle/delayed-ACK stalls on keep-alive connections
+    wbufsize = 64 * 1024
+    delay = 0.0
+
+    def _reply(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        if self.delay:
+            time.sleep(self.delay)
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = _reply
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub_server(delay: float = 0.0):
+    """
+    Start the stub on a free port in a daemon thread; returns (server, base_url).
+    """
+    handler = type("StubHandler", (_Handler,), {"delay": delay})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
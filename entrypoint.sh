@@ -10,5 +10,11 @@ done
 echo "Postgres is up - running migrations..."
 python manage.py migrate --noinput
 
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+  # files left by a previous run would be summed into /metrics
+  rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+  mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
+
 echo "Starting server..."
 exec "$@"
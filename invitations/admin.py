@@ -1,7 +1,24 @@
 from django.contrib import admin
+from django.db import transaction
+
 from .models import Invitation, Tenant, TenantMember
+from .tasks import queue_invitation_email
+
+
+@admin.register(Invitation)
+class InvitationAdmin(admin.ModelAdmin):
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if not change:
+            # the token is generated on save and only known now; send it the
+            # same way the API does
+            transaction.on_commit(
+                lambda: queue_invitation_email(
+                    obj.email, obj.name, obj.tenant.name, obj.token
+                )
+            )
+
 
 # Register your models here.
-admin.site.register(Invitation)
 admin.site.register(Tenant)
 admin.site.register(TenantMember)
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class InvitationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'invitations'
+
+    def ready(self):
+        from invitations import log_queue, metrics, signals  # noqa: F401
+
+        log_queue.install()
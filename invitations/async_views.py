@@ -0,0 +1,216 @@
+"""
+Async counterparts of the views in invitations/views.py, for the ASGI entry
+point. They are plain Django views (DRF's APIView is sync-only), use the
+async ORM and cache APIs directly, and only drop to a thread for work that
+has no async API (the accept transaction, the Celery broker publish and the
+Redis deadline set). Password hashing awaits the hashing process pool.
+
+CSRF is handled as DRF's SessionAuthentication does: the views are exempt
+from CsrfViewMiddleware so anonymous API callers need no token, but a caller
+authenticated by the session cookie must send a valid CSRF token or gets 403.
+"""
+
+import json
+import logging
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.authentication import CSRFCheck
+from rest_framework.exceptions import ValidationError
+
+from accounts.password_hashing import HashingBusy, ahash_password
+from permissions_app.decorators import acheck_permission
+
+from . import expiry_scheduler, log_context
+from .idempotency import aidempotent
+from .models import Invitation
+from .serializers import (
+    InvitationAcceptSerializer,
+    InvitationCreateSerializer,
+    InvitationSerializer,
+)
+from .tasks import queue_invitation_email
+from .tenant_context import INVALID_TENANT, aget_tenant
+
+logger = logging.getLogger(__name__)
+
+
+def _json_body(request):
+    try:
+        return json.loads(request.body or b"{}"), None
+    except ValueError:
+        return None, JsonResponse(
+            {"detail": "Malformed JSON body"}, status=status.HTTP_400_BAD_REQUEST
+        )
+
+
+def session_authenticated(view_method):
+    """
+    Bind the session user, if any, and enforce CSRF for them (403 on
+    failure). Goes outside aidempotent, so a rejected request is never
+    stored or answered from a stored response.
+    """
+
+    @wraps(view_method)
+    async def _wrapped(self, request, *args, **kwargs):
+        user = await request.auser()
+        if user.is_authenticated:
+            check = CSRFCheck(lambda request: None)
+            # populates request.META["CSRF_COOKIE"], used by process_view()
+            check.process_request(request)
+            reason = check.process_view(request, None, (), {})
+            if reason:
+                return JsonResponse(
+                    {"detail": f"CSRF Failed: {reason}"},
+                    status=status.HTTP_403_FORBIDDEN,
+                )
+        log_context.bind_user(user)
+        return await view_method(self, request, *args, **kwargs)
+
+    return _wrapped
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncInvitationCreateView(View):
+    @session_authenticated
+    @aidempotent
+    async def post(self, request):
+        error = request.tenant_error
+        tenant = None
+        if error is None:
+            tenant = await aget_tenant(request.tenant_id)
+            if tenant is None:
+                error = INVALID_TENANT
+        if error is not None:
+            return JsonResponse({"detail": error[0]}, status=error[1])
+
+        data, error = _json_body(request)
+        if error is not None:
+            return error
+
+        ip = request.META.get("REMOTE_ADDR")
+        serializer = InvitationCreateSerializer(
+            data=data, context={"tenant": tenant, "ip": ip}
+        )
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        pending = await serializer.pending_invites().afirst()
+        if pending is not None:
+            return JsonResponse(InvitationSerializer(pending).data)
+
+        invite = serializer.build(serializer.validated_data)
+        await invite.asave()
+        await sync_to_async(expiry_scheduler.schedule)([invite])
+
+        await sync_to_async(queue_invitation_email)(
+            invite.email, invite.name, tenant.name, invite.token
+        )
+
+        logger.info("Invitation created")
+
+        return JsonResponse(
+            InvitationSerializer(invite).data, status=status.HTTP_201_CREATED
+        )
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncInvitationAcceptView(View):
+    """
+    POST /api/async/invitations/accept/
+    Body: { token, password }
+    """
+
+    @session_authenticated
+    @aidempotent
+    async def post(self, request):
+        data, error = _json_body(request)
+        if error is not None:
+            return error
+
+        serializer = InvitationAcceptSerializer(data=data)
+        if not await sync_to_async(serializer.is_valid)():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            password_hash = None
+            if not serializer.user_exists:
+                password_hash = await ahash_password(
+                    serializer.validated_data["password"]
+                )
+            # the accept flow runs in a transaction, which the async ORM
+            # does not support
+            result = await sync_to_async(serializer.save)(password_hash=password_hash)
+        except HashingBusy as exc:
+            return JsonResponse(
+                {"detail": exc.detail}, status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        except ValidationError as exc:
+            # lost a race with a concurrent accept/cancel
+            return JsonResponse(exc.detail, status=status.HTTP_400_BAD_REQUEST)
+
+        log_context.bind(user_id=result["user_id"], tenant_id=result["tenant_id"])
+        logger.info("Invitation accepted")
+
+        return JsonResponse({"detail": "Invitation accepted", **result})
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncInvitationCancelView(View):
+    """
+    POST /api/async/invitations/<id>/cancel/
+    Header: X-Tenant-ID; only the tenant's own invitations can be cancelled.
+    """
+
+    @session_authenticated
+    @aidempotent
+    async def post(self, request, invitation_id: int):
+        if request.tenant_error is not None:
+            return JsonResponse(
+                {"detail": request.tenant_error[0]}, status=request.tenant_error[1]
+            )
+
+        try:
+            invite = await Invitation.objects.aget(
+                id=invitation_id, tenant_id=request.tenant_id
+            )
+        except Invitation.DoesNotExist:
+            return JsonResponse(
+                {"detail": "Not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        if invite.status != Invitation.Status.PENDING:
+            return JsonResponse(
+                {"detail": f"Cannot cancel. Status is {invite.status}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        invite.status = Invitation.Status.CANCELLED
+        await invite.asave(update_fields=["status", "updated_at"])
+
+        logger.info("Invitation cancelled")
+
+        return JsonResponse({"detail": "Invitation cancelled"})
+
+
+class AsyncDashboardView(View):
+    # like DashboardAPIView (authentication_classes = []), every caller is
+    # served as anonymous
+    @acheck_permission(
+        product_id="abc", feature="dashboard", permission="read", anonymous=True
+    )
+    async def get(self, request):
+        logger.info("Dashboard accessed")
+
+        return JsonResponse(
+            {
+                "tenant_id": request.tenant_id,
+                "role": request.role,
+                "message": "Dashboard data",
+            }
+        )
@@ -0,0 +1,150 @@
+"""
+Bulk invitation creation: parse rows from JSON or CSV, validate and dedupe
+them in one pass, insert with bulk_create in chunks, and enqueue the emails
+as batched tasks once the rows are committed.
+"""
+
+import csv
+import io
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import EmailValidator
+from django.db import transaction
+
+from . import expiry_scheduler
+from .models import Invitation
+from .tasks import send_invitation_email_batch
+
+CREATED = "created"
+DUPLICATE = "duplicate"
+INVALID = "invalid"
+
+_validate_email = EmailValidator()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class BulkInviteError(Exception):
+    pass
+
+
+def parse_rows(data, files) -> list:
+    """
+    Return [(email, note), ...] from an uploaded CSV (`file`, columns
+    email[,note], header optional) or a JSON body, either a list of
+    {"email", "note"} objects or {"invitations": [...]}.
+    """
+    upload = files.get("file") if files else None
+    if upload is not None:
+        try:
+            text = upload.read().decode("utf-8-sig")
+        except UnicodeDecodeError:
+            raise BulkInviteError("CSV file must be UTF-8")
+        reader = csv.reader(io.StringIO(text))
+        rows = [row for row in reader if row and any(cell.strip() for cell in row)]
+        if rows and rows[0][0].strip().lower() == "email":
+            rows = rows[1:]
+        parsed = [(row[0], row[1] if len(row) > 1 else "") for row in rows]
+    else:
+        items = data.get("invitations") if isinstance(data, dict) else data
+        if not isinstance(items, list):
+            raise BulkInviteError('Expected a list or {"invitations": [...]}')
+        parsed = [
+            (
+                (item.get("email", ""), item.get("note", ""))
+                if isinstance(item, dict)
+                else ("", "")
+            )
+            for item in items
+        ]
+
+    max_rows = _setting("BULK_INVITE_MAX_ROWS", 20000)
+    if len(parsed) > max_rows:
+        raise BulkInviteError(f"At most {max_rows} rows per request")
+    return parsed
+
+
+def create_bulk_invitations(tenant, rows, ip=None):
+    """
+    Create invitations for `rows` in `tenant`; return one result dict per row.
+
+    Rows with an invalid email, repeated in the batch, or already holding a
+    pending invite for this tenant are reported and skipped.
+    """
+    results = []
+    candidates = {}
+    for index, (email, note) in enumerate(rows):
+        email = str(email or "").strip().lower()
+        result = {"row": index, "email": email}
+        results.append(result)
+        try:
+            _validate_email(email)
+        except ValidationError:
+            result.update(status=INVALID, error="Enter a valid email address.")
+            continue
+        if email in candidates:
+            result.update(status=DUPLICATE, error="Repeated in this request")
+            continue
+        candidates[email] = (result, str(note or ""))
+
+    chunk_size = _setting("BULK_INVITE_CHUNK_SIZE", 1000)
+    emails = list(candidates)
+    for start in range(0, len(emails), chunk_size):
+        # served by the (email, tenant) index
+        pending = Invitation.objects.filter(
+            tenant=tenant,
+            email__in=emails[start : start + chunk_size],
+            status=Invitation.Status.PENDING,
+        ).values_list("email", flat=True)
+        for email in pending:
+            # nothing keeps a tenant from holding several pending invites
+            # for one email; only the first occurrence is left to report
+            entry = candidates.pop(email, None)
+            if entry is not None:
+                entry[0].update(status=DUPLICATE, error="Pending invitation exists")
+
+    expiry = Invitation.default_expiry()
+    invites = [
+        Invitation(
+            tenant=tenant,
+            name=email.split("@")[0],
+            email=email,
+            status=Invitation.Status.PENDING,
+            token=Invitation.generate_token(),
+            expiration_date=expiry,
+            invited_ip=ip,
+            note=note,
+        )
+        for email, (_, note) in candidates.items()
+    ]
+
+    with transaction.atomic():
+        for start in range(0, len(invites), chunk_size):
+            Invitation.objects.bulk_create(invites[start : start + chunk_size])
+        transaction.on_commit(lambda: expiry_scheduler.schedule(invites))
+        transaction.on_commit(lambda: enqueue_invitation_emails(tenant, invites))
+
+    for invite in invites:
+        result, _ = candidates[invite.email]
+        result.update(status=CREATED, id=invite.id)
+
+    return results
+
+
+def enqueue_invitation_emails(tenant, invites):
+    batch_size = _setting("INVITE_EMAIL_BATCH_SIZE", 100)
+    for start in range(0, len(invites), batch_size):
+        send_invitation_email_batch.delay(
+            [
+                {
+                    "email": invite.email,
+                    "name": invite.name,
+                    "tenant_name": tenant.name,
+                    "token": invite.token,
+                }
+                for invite in invites[start : start + batch_size]
+            ]
+        )
@@ -1,47 +1,176 @@
-from datetime import timedelta
 import time
 from django.core.cache import cache
 
+from invitations.shared_cache import redis_client
+
 FAILURE_THRESHOLD = 3
 FAILURE_WINDOW_SECONDS = 60
 CIRCUIT_OPEN_SECONDS = 120
 
+# Each consecutive re-open doubles the open period, up to this cap.
+CIRCUIT_MAX_OPEN_SECONDS = 960
+
+# Once the open period ends the circuit is HALF_OPEN: at most
+# HALF_OPEN_MAX_PROBES calls may be in flight, and HALF_OPEN_SUCCESSES
+# consecutive successful probes close it. Any failed probe re-opens it.
+HALF_OPEN_MAX_PROBES = 1
+HALF_OPEN_SUCCESSES = 3
+# Bounds how long a probe slot stays taken if its caller dies mid-call.
+PROBE_SLOT_SECONDS = 30
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# The failure window is split into fixed buckets; each failure increments
+# the counter of the current bucket and the count is the sum of the last
+# FAILURE_BUCKETS counters.
+FAILURE_BUCKET_SECONDS = 10
+FAILURE_BUCKETS = FAILURE_WINDOW_SECONDS // FAILURE_BUCKET_SECONDS
+
 CIRCUIT_PREFIX = "circuit"
 FAILURE_PREFIX = "failures"
 
 
-def _failure_key(domain):
-    return f"{FAILURE_PREFIX}:{domain}"
+def _failure_key(domain, bucket):
+    return f"{FAILURE_PREFIX}:{domain}:{bucket}"
 
 
 def _circuit_key(domain):
     return f"{CIRCUIT_PREFIX}:{domain}"
 
 
+def _trips_key(domain):
+    return f"{CIRCUIT_PREFIX}:{domain}:trips"
+
+
+def _probes_key(domain):
+    return f"{CIRCUIT_PREFIX}:{domain}:probes"
+
+
+def _successes_key(domain):
+    return f"{CIRCUIT_PREFIX}:{domain}:successes"
+
+
+def _window_keys(domain, now=None):
+    current = int((now or time.time()) // FAILURE_BUCKET_SECONDS)
+    return [
+        _failure_key(domain, bucket)
+        for bucket in range(current - FAILURE_BUCKETS + 1, current + 1)
+    ]
+
+
+def _incr(key, ttl) -> int:
+    cache.add(key, 0, timeout=ttl)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # key expired between add() and incr()
+        cache.set(key, 1, timeout=ttl)
+        return 1
+
+
+def get_state(domain: str) -> str:
+    values = cache.get_many([_circuit_key(domain), _trips_key(domain)])
+    if values.get(_circuit_key(domain)) is True:
+        return OPEN
+    if values.get(_trips_key(domain)):
+        return HALF_OPEN
+    return CLOSED
+
+
 def is_circuit_open(domain: str) -> bool:
     return cache.get(_circuit_key(domain)) is True
 
 
-def record_failure(domain: str) -> int:
+def acquire_probe(domain: str) -> bool:
+    """
+    Take one of the HALF_OPEN_MAX_PROBES probe slots; False if none is free.
     """
-    Record a failure and return current failure count
+    if _incr(_probes_key(domain), PROBE_SLOT_SECONDS) > HALF_OPEN_MAX_PROBES:
+        release_probe(domain)
+        return False
+    return True
+
+
+def release_probe(domain: str):
+    try:
+        cache.decr(_probes_key(domain))
+    except ValueError:
+        pass
+
+
+def record_failure(domain: str) -> int:
     """
-    key = _failure_key(domain)
-    failures = cache.get(key, [])
+    Record a failure and return the failure count over the sliding window.
 
-    now = time.time()
-    failures.append(now)
+    O(1): one atomic increment plus a read of FAILURE_BUCKETS counters. On
+    Redis both happen in a single pipeline round trip, so every web and
+    celery process sees the same count.
+    """
+    keys = _window_keys(domain)
+    ttl = FAILURE_WINDOW_SECONDS + FAILURE_BUCKET_SECONDS
 
-    failures = [ts for ts in failures if now - ts <= FAILURE_WINDOW_SECONDS]
+    backend, client = redis_client()
+    if client is not None:
+        raw_keys = [backend.make_and_validate_key(key) for key in keys]
+        pipe = client.pipeline()
+        pipe.incr(raw_keys[-1])
+        pipe.expire(raw_keys[-1], ttl)
+        pipe.mget(raw_keys)
+        _, _, counts = pipe.execute()
+        return sum(int(count) for count in counts if count is not None)
 
-    cache.set(key, failures, timeout=FAILURE_WINDOW_SECONDS)
-    return len(failures)
+    _incr(keys[-1], ttl)
+    return sum(cache.get_many(keys).values())
 
 
-def open_circuit(domain: str):
-    cache.set(_circuit_key(domain), True, timeout=CIRCUIT_OPEN_SECONDS)
+def open_circuit(domain: str) -> int:
+    """
+    Open the circuit with exponential backoff and return the open period.
+    """
+    trips = _incr(_trips_key(domain), CIRCUIT_MAX_OPEN_SECONDS * 2)
+    open_seconds = min(
+        CIRCUIT_OPEN_SECONDS * 2 ** (trips - 1), CIRCUIT_MAX_OPEN_SECONDS
+    )
+    cache.set(_circuit_key(domain), True, timeout=open_seconds)
+    # the trips key is what marks HALF_OPEN once the open key expires
+    cache.touch(_trips_key(domain), open_seconds + CIRCUIT_MAX_OPEN_SECONDS)
+    cache.delete_many([_probes_key(domain), _successes_key(domain)])
+    return open_seconds
 
 
 def close_circuit(domain: str):
-    cache.delete(_circuit_key(domain))
-    cache.delete(_failure_key(domain))
+    cache.delete_many(
+        [
+            _circuit_key(domain),
+            _trips_key(domain),
+            _probes_key(domain),
+            _successes_key(domain),
+            *_window_keys(domain),
+        ]
+    )
+
+
+def on_success(domain: str, probe: bool = False):
+    """
+    Closed-state successes cost nothing; probe successes count towards
+    closing the circuit.
+    """
+    if not probe:
+        return
+    successes = _incr(_successes_key(domain), CIRCUIT_MAX_OPEN_SECONDS)
+    if successes >= HALF_OPEN_SUCCESSES:
+        close_circuit(domain)
+
+
+def on_failure(domain: str, probe: bool = False) -> bool:
+    """
+    Record a failed call; return True if it opened the circuit.
+    """
+    if probe or record_failure(domain) > FAILURE_THRESHOLD:
+        # another caller may already have tripped it; don't double the backoff
+        if not is_circuit_open(domain):
+            open_circuit(domain)
+        return True
+    return False
@@ -0,0 +1,114 @@
+"""
+Deadline-driven invitation expiry.
+
+Pending invitations that expire within EXPIRY_HORIZON_SECONDS are kept in a
+Redis sorted set scored by expiration timestamp. The expire_due_invitations
+task ticks every few seconds and only looks at the head of that set, so an
+invitation is marked Expired within one tick of its deadline without
+scanning the table. The expire_invitations sweep, also in
+CELERY_BEAT_SCHEDULE (hourly by default), stays as a safety net and refills
+the set with the next horizon of deadlines.
+
+Requires a Redis cache (CACHE_URL); without one, available() is False and
+the tick falls back to the chunked database sweep.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Invitation
+from .shared_cache import redis_client
+
+DEADLINES_KEY = "invitation_expiry:deadlines"
+
+
+def _horizon() -> timedelta:
+    return timedelta(seconds=getattr(settings, "EXPIRY_HORIZON_SECONDS", 2 * 3600))
+
+
+def _deadlines():
+    backend, client = redis_client()
+    if client is None:
+        return None, None
+    return backend.make_and_validate_key(DEADLINES_KEY), client
+
+
+def available() -> bool:
+    return _deadlines()[1] is not None
+
+
+def schedule(invites):
+    """
+    Track the deadlines of freshly created invites that fall within the
+    horizon; later ones are picked up by refill().
+    """
+    key, client = _deadlines()
+    if client is None:
+        return
+    limit = timezone.now() + _horizon()
+    mapping = {
+        str(invite.id): invite.expiration_date.timestamp()
+        for invite in invites
+        if invite.expiration_date <= limit
+    }
+    if mapping:
+        client.zadd(key, mapping)
+
+
+def refill(chunk_size: int = 1000) -> int:
+    """
+    Load every pending deadline within the horizon from the partial
+    pending-expiry index, in keyset order. Returns the number loaded.
+    """
+    key, client = _deadlines()
+    if client is None:
+        return 0
+
+    limit = timezone.now() + _horizon()
+    qs = Invitation.objects.filter(
+        status=Invitation.Status.PENDING, expiration_date__lte=limit
+    ).order_by("expiration_date", "id")
+    loaded = 0
+    last = None
+    while True:
+        page = qs
+        if last is not None:
+            page = page.filter(
+                Q(expiration_date__gt=last[0])
+                | Q(expiration_date=last[0], id__gt=last[1])
+            )
+        rows = list(page.values_list("expiration_date", "id")[:chunk_size])
+        if not rows:
+            return loaded
+        client.zadd(key, {str(pk): expires.timestamp() for expires, pk in rows})
+        loaded += len(rows)
+        last = rows[-1]
+
+
+def expire_due(batch_size: int = 1000) -> int:
+    """
+    Expire every tracked invitation whose deadline has passed.
+    """
+    key, client = _deadlines()
+    if client is None:
+        return 0
+
+    now = timezone.now()
+    expired = 0
+    while True:
+        ids = client.zrangebyscore(
+            key, "-inf", now.timestamp(), start=0, num=batch_size
+        )
+        if not ids:
+            return expired
+        with transaction.atomic():
+            expired += Invitation.objects.filter(
+                id__in=[int(pk) for pk in ids],
+                status=Invitation.Status.PENDING,
+                expiration_date__lte=now,
+            ).update(status=Invitation.Status.EXPIRED, updated_at=now)
+        client.zrem(key, *ids)
@@ -1,84 +1,260 @@
 import logging
-import requests
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextvars import copy_context
 from urllib.parse import urlparse
 
+from django.conf import settings
+
+from invitations import log_context, metrics
 from invitations.circuit_breaker import (
-    record_failure,
-    open_circuit,
-    close_circuit,
-    FAILURE_THRESHOLD,
+    HALF_OPEN,
+    OPEN,
+    acquire_probe,
+    get_state,
+    is_circuit_open,
+    on_failure,
+    on_success,
+    release_probe,
 )
+from invitations.http_sessions import get_session, get_timeout
 from invitations.middleware_circuit import ExternalServiceBlocked
+from invitations.outbound_policy import (
+    MIN_SAMPLES_FOR_HEDGE,
+    backoff_delay,
+    latency_tracker,
+    retry_budget,
+)
 
 logger = logging.getLogger(__name__)
 
+# One entry per call passed to call_many: `response` on success, otherwise
+# `error` holds the exception (ExternalServiceBlocked, TimeoutError, ...).
+CallResult = namedtuple("CallResult", ["url", "response", "error"])
+
+# Separate pools for call_many fan-out and for hedged attempts, so a
+# saturated fan-out pool can never starve the hedges its calls wait on.
+_executor_lock = threading.Lock()
+_executors = {}
+
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
 
 def call_external_service(
     *,
     url: str,
     method: str = "GET",
     request=None,
+    retries: int = None,
+    hedge: bool = None,
     **kwargs,
 ):
     """
     Wrapper around requests that enforces circuit breaker + propagates trace id.
+
+    Trace and tenant ids come from `request` when given, otherwise from the
+    current log_context (e.g. inside a Celery task).
+
+    While the circuit is OPEN calls are blocked; while HALF_OPEN only the
+    callers holding a probe slot get through.
+
+    Idempotent methods are retried on errors and 5xx up to `retries` times
+    (default HTTP_CLIENT_RETRIES) with jittered backoff, and may be hedged:
+    a second attempt is sent once the domain's observed p95 latency passes
+    and the first response wins (default: domain in HTTP_CLIENT_HEDGE_DOMAINS).
+    Retries and hedges both draw from the domain's retry budget.
+
+    The circuit breaker sees one failure per call once its retries are
+    exhausted, however many attempts it made; a failed probe re-opens the
+    circuit straight away.
     """
     domain = urlparse(url).netloc
 
     headers = kwargs.pop("headers", {}) or {}
-    trace_id = getattr(request, "trace_id", None) if request else None
+    trace_id = getattr(request, "trace_id", None) or log_context.trace_id.get()
     if trace_id:
         headers.setdefault("X-Trace-ID", trace_id)
 
-    tenant_id = getattr(request, "tenant_id", None) if request else None
+    tenant_id = getattr(request, "tenant_id", None) or log_context.tenant_id.get()
     if tenant_id:
         headers.setdefault("X-Tenant-ID", str(tenant_id))
 
     kwargs["headers"] = headers
+    kwargs.setdefault("timeout", get_timeout(domain))
+
+    idempotent = method.upper() in IDEMPOTENT_METHODS
+    if retries is None:
+        retries = getattr(settings, "HTTP_CLIENT_RETRIES", 0) if idempotent else 0
+    if hedge is None:
+        hedge = idempotent and domain in getattr(
+            settings, "HTTP_CLIENT_HEDGE_DOMAINS", ()
+        )
+
+    retry_budget.deposit(domain)
+    attempt = 0
+    while True:
+        try:
+            if hedge:
+                response = _hedged_attempt(domain, method, url, kwargs)
+            else:
+                response = _attempt(domain, method, url, kwargs)
+        except ExternalServiceBlocked:
+            raise
+        except Exception:
+            if attempt >= retries or not retry_budget.withdraw(domain):
+                _record_failure(domain)
+                raise
+        else:
+            if response.status_code < 500:
+                return response
+            if attempt >= retries or not retry_budget.withdraw(domain):
+                _record_failure(domain)
+                return response
+            response.close()
+
+        attempt += 1
+        time.sleep(backoff_delay(attempt))
+
+
+def _attempt(domain, method, url, kwargs):
+    state = get_state(domain)
+    metrics.record_circuit_state(domain, state)
+    probe = state == HALF_OPEN
+    if state == OPEN or (probe and not acquire_probe(domain)):
+        logger.warning("Circuit open – outbound request blocked")
+        raise ExternalServiceBlocked(f"Circuit {state} for {domain}")
 
     try:
-        response = requests.request(method, url, timeout=5, **kwargs)
+        started = time.monotonic()
+        response = get_session(domain).request(method, url, **kwargs)
+        elapsed = time.monotonic() - started
 
         if response.status_code >= 500:
-            failures = record_failure(domain)
-
-            logger.error(
-                "External service failure",
-                extra={
-                    "trace_id": trace_id,
-                    "user_id": (
-                        request.user.id
-                        if request and request.user.is_authenticated
-                        else None
-                    ),
-                    "tenant_id": tenant_id,
-                },
-            )
-
-            if failures > FAILURE_THRESHOLD:
-                open_circuit(domain)
-                logger.error(
-                    "Circuit opened",
-                    extra={
-                        "trace_id": trace_id,
-                        "user_id": (
-                            request.user.id
-                            if request and request.user.is_authenticated
-                            else None
-                        ),
-                        "tenant_id": tenant_id,
-                    },
-                )
+            metrics.record_outbound(domain, elapsed, "server_error")
+            logger.error("External service failure")
+            if probe:
+                _record_failure(domain, probe)
         else:
-            close_circuit(domain)
+            metrics.record_outbound(domain, elapsed, "ok")
+            latency_tracker.record(domain, elapsed)
+            on_success(domain, probe)
 
         return response
 
-    except ExternalServiceBlocked:
-        raise
-
     except Exception:
-        failures = record_failure(domain)
-        if failures > FAILURE_THRESHOLD:
-            open_circuit(domain)
+        metrics.record_outbound(domain, time.monotonic() - started, "error")
+        if probe:
+            _record_failure(domain, probe)
         raise
+
+    finally:
+        if probe:
+            release_probe(domain)
+
+
+def _record_failure(domain, probe=False):
+    # a failed probe has already re-opened the circuit; the call it belonged
+    # to is not counted again
+    if not probe and is_circuit_open(domain):
+        return
+    if on_failure(domain, probe):
+        metrics.record_circuit_state(domain, OPEN)
+        logger.error("Circuit opened")
+
+
+def _hedged_attempt(domain, method, url, kwargs):
+    delay = latency_tracker.percentile(domain, 95, MIN_SAMPLES_FOR_HEDGE)
+    if delay is None:
+        return _attempt(domain, method, url, kwargs)
+
+    executor = _get_executor("hedge", "HTTP_CLIENT_HEDGE_WORKERS")
+    futures = [_submit(executor, _attempt, domain, method, url, kwargs)]
+    done, _ = wait(futures, timeout=delay)
+    if not done and retry_budget.withdraw(domain):
+        futures.append(_submit(executor, _attempt, domain, method, url, kwargs))
+
+    pending = set(futures)
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+    # every attempt failed; surface the first one's error
+    return futures[0].result()
+
+
+def _get_executor(name: str, workers_setting: str) -> ThreadPoolExecutor:
+    executor = _executors.get(name)
+    if executor is None:
+        with _executor_lock:
+            executor = _executors.get(name)
+            if executor is None:
+                executor = _executors[name] = ThreadPoolExecutor(
+                    max_workers=getattr(settings, workers_setting, 16),
+                    thread_name_prefix=name,
+                )
+    return executor
+
+
+def _submit(executor, fn, *args, **kwargs):
+    # pool threads run the call in a copy of the caller's log_context
+    return executor.submit(copy_context().run, fn, *args, **kwargs)
+
+
+def _reset_executor():
+    # worker threads do not survive fork; build a fresh pool in the child
+    global _executor_lock
+    _executors.clear()
+    _executor_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_executor)
+
+
+def call_many(calls, *, request=None, timeout=None):
+    """
+    Run several call_external_service calls concurrently on a bounded pool.
+
+    `calls` is a list of dicts of call_external_service keyword arguments
+    (url, method, json, timeout, ...). Each call keeps its own circuit
+    breaker checks and trace/tenant headers. `timeout` is an overall
+    deadline in seconds: per-call timeouts are clipped to what remains, and
+    calls still running when it passes are reported with a TimeoutError.
+
+    Returns one CallResult per call, in the order given. Failures are
+    reported per call and never abort the batch.
+    """
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    executor = _get_executor("call_many", "HTTP_CLIENT_FANOUT_WORKERS")
+
+    futures = []
+    for call in calls:
+        call = dict(call)
+        if deadline is not None:
+            domain = urlparse(call["url"]).netloc
+            per_call = call.get("timeout", get_timeout(domain))
+            call["timeout"] = min(per_call, max(deadline - time.monotonic(), 0.001))
+        futures.append(
+            _submit(executor, call_external_service, request=request, **call)
+        )
+
+    remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+    wait(futures, timeout=remaining)
+
+    results = []
+    for call, future in zip(calls, futures):
+        if not future.done():
+            future.cancel()
+            results.append(
+                CallResult(call["url"], None, TimeoutError("Overall deadline exceeded"))
+            )
+        elif future.exception() is not None:
+            results.append(CallResult(call["url"], None, future.exception()))
+        else:
+            results.append(CallResult(call["url"], future.result(), None))
+    return results
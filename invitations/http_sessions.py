@@ -0,0 +1,75 @@
+"""
+Per-domain pooled requests.Session registry used by call_external_service.
+
+Each outbound domain gets one Session whose HTTPAdapter keeps up to
+HTTP_CLIENT_POOL_SIZE keep-alive connections, so repeated calls to the same
+service reuse TCP/TLS connections. Sessions are shared by all threads of a
+process and dropped in forked children (celery prefork), which must not
+share sockets with their parent.
+"""
+
+import os
+import threading
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+_lock = threading.Lock()
+_sessions = {}
+
+
+def _pool_size(domain: str) -> int:
+    overrides = getattr(settings, "HTTP_CLIENT_DOMAIN_POOL_SIZES", {})
+    return overrides.get(domain, getattr(settings, "HTTP_CLIENT_POOL_SIZE", 10))
+
+
+def get_timeout(domain: str):
+    overrides = getattr(settings, "HTTP_CLIENT_DOMAIN_TIMEOUTS", {})
+    return overrides.get(domain, getattr(settings, "HTTP_CLIENT_TIMEOUT", 5))
+
+
+def _build_session(domain: str) -> requests.Session:
+    session = requests.Session()
+    # never persist cookies between calls made on behalf of different users
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+    size = _pool_size(domain)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=size, pool_block=False)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_session(domain: str) -> requests.Session:
+    session = _sessions.get(domain)
+    if session is not None:
+        return session
+
+    with _lock:
+        session = _sessions.get(domain)
+        if session is None:
+            session = _sessions[domain] = _build_session(domain)
+        return session
+
+
+def reset():
+    """
+    Drop every session. Called in forked children; pooled sockets belong
+    to the parent and are simply abandoned, not closed.
+    """
+    global _lock
+    _lock = threading.Lock()
+    _sessions.clear()
+
+
+def close_all():
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=reset)
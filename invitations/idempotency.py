@@ -0,0 +1,200 @@
+"""
+Idempotency-Key support for mutating endpoints: `idempotent` for DRF views,
+`aidempotent` for the async views.
+
+The first request with a given key runs the view while holding a short
+cache lock; its response (unless 5xx, 401 or 403) is stored for
+IDEMPOTENCY_TTL seconds and replayed for every retry with the same key. Concurrent duplicates wait
+for the in-flight request instead of running the view a second time. Keys
+are scoped to the endpoint, tenant and caller, and reusing a key with a
+different request body is rejected with 422.
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse
+from rest_framework import status
+from rest_framework.response import Response
+
+IDEMPOTENCY_PREFIX = "idempotency"
+MAX_KEY_LENGTH = 255
+
+KEY_TOO_LONG = f"Idempotency-Key longer than {MAX_KEY_LENGTH} characters"
+IN_PROGRESS = "A request with this Idempotency-Key is in progress"
+KEY_REUSED = "Idempotency-Key was already used with a different request"
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _digest(data) -> str:
+    blob = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+def _fingerprint(request) -> str:
+    data = request.data
+    if hasattr(data, "lists"):
+        # form / multipart QueryDict; uploaded files serialize as their names
+        data = sorted(data.lists())
+    return _digest(data)
+
+
+def _body_fingerprint(body: bytes) -> str:
+    try:
+        return _digest(json.loads(body or b"{}"))
+    except ValueError:
+        return hashlib.sha256(body).hexdigest()
+
+
+def _cache_keys(request, user, key):
+    scope = ":".join(
+        [
+            request.method,
+            request.path,
+            request.headers.get("X-Tenant-ID", ""),
+            str(user.id) if user.is_authenticated else "anon",
+            key,
+        ]
+    )
+    digest = hashlib.sha256(scope.encode()).hexdigest()
+    return (
+        f"{IDEMPOTENCY_PREFIX}:response:{digest}",
+        f"{IDEMPOTENCY_PREFIX}:lock:{digest}",
+    )
+
+
+def _replay(entry, fingerprint, response_class=Response):
+    if entry["fingerprint"] != fingerprint:
+        return response_class(
+            {"detail": KEY_REUSED}, status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    return response_class(
+        entry["data"], status=entry["status"], headers={"Idempotent-Replayed": "true"}
+    )
+
+
+def _storable(response) -> bool:
+    # a 5xx may succeed on retry, and auth/CSRF rejections are about the
+    # attempt rather than the request: a corrected retry must run the view
+    return response.status_code < 500 and response.status_code not in (
+        status.HTTP_401_UNAUTHORIZED,
+        status.HTTP_403_FORBIDDEN,
+    )
+
+
+def _entry(fingerprint, response, data):
+    return {"fingerprint": fingerprint, "status": response.status_code, "data": data}
+
+
+def idempotent(view_method):
+    @wraps(view_method)
+    def _wrapped(self, request, *args, **kwargs):
+        key = request.headers.get("Idempotency-Key")
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {"detail": KEY_TOO_LONG}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        response_key, lock_key = _cache_keys(request, request.user, key)
+        fingerprint = _fingerprint(request)
+        lock_seconds = _setting("IDEMPOTENCY_LOCK_SECONDS", 30)
+        deadline = time.monotonic() + _setting("IDEMPOTENCY_WAIT_SECONDS", 10)
+        owner = uuid.uuid4().hex
+        delay = 0.05
+
+        while True:
+            entry = cache.get(response_key)
+            if entry is not None:
+                return _replay(entry, fingerprint)
+
+            if cache.add(lock_key, owner, timeout=lock_seconds):
+                break
+
+            # a duplicate is in flight: wait for its stored response, or take
+            # over if it finished without storing one (5xx or an exception)
+            if time.monotonic() >= deadline:
+                return Response(
+                    {"detail": IN_PROGRESS}, status=status.HTTP_409_CONFLICT
+                )
+            time.sleep(delay)
+            delay = min(delay * 2, 0.5)
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+            if _storable(response):
+                cache.set(
+                    response_key,
+                    _entry(fingerprint, response, response.data),
+                    timeout=_setting("IDEMPOTENCY_TTL", 24 * 3600),
+                )
+            return response
+        finally:
+            if cache.get(lock_key) == owner:
+                cache.delete(lock_key)
+
+    return _wrapped
+
+
+def aidempotent(view_method):
+    """
+    idempotent for `async def` methods on plain Django views returning
+    JsonResponse.
+    """
+
+    @wraps(view_method)
+    async def _wrapped(self, request, *args, **kwargs):
+        key = request.headers.get("Idempotency-Key")
+        if not key:
+            return await view_method(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return JsonResponse(
+                {"detail": KEY_TOO_LONG}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        response_key, lock_key = _cache_keys(request, await request.auser(), key)
+        fingerprint = _body_fingerprint(request.body)
+        lock_seconds = _setting("IDEMPOTENCY_LOCK_SECONDS", 30)
+        deadline = time.monotonic() + _setting("IDEMPOTENCY_WAIT_SECONDS", 10)
+        owner = uuid.uuid4().hex
+        delay = 0.05
+
+        while True:
+            entry = await cache.aget(response_key)
+            if entry is not None:
+                return _replay(entry, fingerprint, JsonResponse)
+
+            if await cache.aadd(lock_key, owner, timeout=lock_seconds):
+                break
+
+            if time.monotonic() >= deadline:
+                return JsonResponse(
+                    {"detail": IN_PROGRESS}, status=status.HTTP_409_CONFLICT
+                )
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.5)
+
+        try:
+            response = await view_method(self, request, *args, **kwargs)
+            if _storable(response):
+                await cache.aset(
+                    response_key,
+                    _entry(fingerprint, response, json.loads(response.content)),
+                    timeout=_setting("IDEMPOTENCY_TTL", 24 * 3600),
+                )
+            return response
+        finally:
+            if await cache.aget(lock_key) == owner:
+                await cache.adelete(lock_key)
+
+    return _wrapped
@@ -0,0 +1,66 @@
+"""
+Trace, tenant and user ids for log records, kept in contextvars.
+
+TraceIDMiddleware binds trace_id and TenantContextMiddleware binds tenant_id
+for the duration of the request; the permission layer binds user_id once it
+knows the caller. RequestContextFilter reads them for every record logged in
+that context, so log calls need no `extra` dict. Explicit `extra` values
+still win.
+
+The context travels with Celery tasks in the `log_context` message header
+(see multi_tenant_system/celery.py) and is restored in the worker while the
+task runs, so web, worker and outgoing mail lines share a trace id. Work
+handed to a thread pool must be submitted through copy_context().run to
+keep it.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+HEADER = "log_context"
+
+trace_id = ContextVar("trace_id", default=None)
+tenant_id = ContextVar("tenant_id", default=None)
+user_id = ContextVar("user_id", default=None)
+
+_VARS = {"trace_id": trace_id, "tenant_id": tenant_id, "user_id": user_id}
+
+
+def bind(**values) -> list:
+    """
+    Set the given fields; returns tokens for reset().
+    """
+    return [_VARS[name].set(value) for name, value in values.items()]
+
+
+def reset(tokens):
+    for token in reversed(tokens):
+        token.var.reset(token)
+
+
+@contextmanager
+def bound(**values):
+    tokens = bind(**values)
+    try:
+        yield
+    finally:
+        reset(tokens)
+
+
+def bind_user(user):
+    if user.is_authenticated:
+        user_id.set(user.id)
+
+
+def snapshot() -> dict:
+    context = {}
+    for name, var in _VARS.items():
+        value = var.get()
+        if value is not None:
+            context[name] = value
+    return context
+
+
+def restore(context) -> list:
+    # every field, so nothing carries over from the previous task
+    return bind(**{name: context.get(name) for name in _VARS})
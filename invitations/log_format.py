@@ -0,0 +1,182 @@
+"""
+JSON log formatter for our fixed schema.
+
+Produces byte-for-byte the lines python-json-logger's JsonFormatter writes
+for the LOGGING format string (asctime, levelname, name, message, service,
+trace_id, user_id, tenant_id, then exc_info/stack_info and any other
+`extra` attributes), which is what promtail ships to Loki. It skips the
+format-string parsing and the generic dict/encoder round trip: the line is
+assembled from pre-encoded keys, cached level/logger names and the C string
+encoder, and the asctime prefix is reused within the same second.
+"""
+
+import json
+import logging
+import time
+import traceback
+from datetime import date, datetime
+from datetime import time as dt_time
+from inspect import istraceback
+from json.encoder import encode_basestring_ascii
+
+FIELDS = (
+    "asctime",
+    "levelname",
+    "name",
+    "message",
+    "service",
+    "trace_id",
+    "user_id",
+    "tenant_id",
+)
+
+# LogRecord attributes python-json-logger never copies into the output
+RESERVED_ATTRS = frozenset(
+    (
+        "args",
+        "asctime",
+        "created",
+        "exc_info",
+        "exc_text",
+        "filename",
+        "funcName",
+        "levelname",
+        "levelno",
+        "lineno",
+        "module",
+        "msecs",
+        "message",
+        "msg",
+        "name",
+        "pathname",
+        "process",
+        "processName",
+        "relativeCreated",
+        "stack_info",
+        "thread",
+        "threadName",
+    )
+)
+_SKIP = RESERVED_ATTRS | set(FIELDS)
+
+
+class _Encoder(json.JSONEncoder):
+    # same fallbacks as pythonjsonlogger.jsonlogger.JsonEncoder
+    def default(self, obj):
+        if isinstance(obj, (date, datetime, dt_time)):
+            return obj.isoformat()
+        if istraceback(obj):
+            return "".join(traceback.format_tb(obj)).strip()
+        if isinstance(obj, Exception) or type(obj) is type:
+            return str(obj)
+        try:
+            return super().default(obj)
+        except TypeError:
+            try:
+                return str(obj)
+            except Exception:
+                return None
+
+
+_encode_any = _Encoder().encode
+
+
+def _value(value) -> str:
+    if value is None:
+        return "null"
+    kind = type(value)
+    if kind is str:
+        return encode_basestring_ascii(value)
+    if kind is int:
+        return int.__repr__(value)
+    if value is True:
+        return "true"
+    if value is False:
+        return "false"
+    return _encode_any(value)
+
+
+class JsonFormatter(logging.Formatter):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._names = {}
+        self._second = (None, "")
+
+    def _encoded_name(self, name: str) -> str:
+        encoded = self._names.get(name)
+        if encoded is None:
+            encoded = self._names[name] = encode_basestring_ascii(name)
+        return encoded
+
+    def _asctime(self, record) -> str:
+        if self.datefmt:
+            return self.formatTime(record, self.datefmt)
+        second = int(record.created)
+        cached = self._second
+        if cached[0] != second:
+            cached = (
+                second,
+                time.strftime(self.default_time_format, self.converter(record.created)),
+            )
+            self._second = cached
+        return self.default_msec_format % (cached[1], record.msecs)
+
+    def format(self, record):
+        if isinstance(record.msg, dict):
+            return self._format_dict_message(record)
+
+        record.message = message = record.getMessage()
+        record.asctime = asctime = self._asctime(record)
+        attrs = record.__dict__
+        parts = [
+            '{"asctime": "',
+            asctime,
+            '", "levelname": ',
+            self._encoded_name(record.levelname),
+            ', "name": ',
+            self._encoded_name(record.name),
+            ', "message": ',
+            encode_basestring_ascii(message),
+            ', "service": ',
+            _value(attrs.get("service")),
+            ', "trace_id": ',
+            _value(attrs.get("trace_id")),
+            ', "user_id": ',
+            _value(attrs.get("user_id")),
+            ', "tenant_id": ',
+            _value(attrs.get("tenant_id")),
+        ]
+
+        if record.exc_info:
+            parts += (', "exc_info": ', _value(self.formatException(record.exc_info)))
+        elif record.exc_text:
+            parts += (', "exc_info": ', _value(record.exc_text))
+        if record.stack_info:
+            parts += (', "stack_info": ', _value(self.formatStack(record.stack_info)))
+
+        for key, value in attrs.items():
+            if key not in _SKIP and not key.startswith("_"):
+                parts += (", ", encode_basestring_ascii(key), ": ", _value(value))
+
+        parts.append("}")
+        return "".join(parts)
+
+    def _format_dict_message(self, record):
+        # rare: logger.info({...}); the dict's keys are merged into the line
+        message_dict = dict(record.msg)
+        record.message = ""
+        record.asctime = self._asctime(record)
+        if record.exc_info and not message_dict.get("exc_info"):
+            message_dict["exc_info"] = self.formatException(record.exc_info)
+        if not message_dict.get("exc_info") and record.exc_text:
+            message_dict["exc_info"] = record.exc_text
+        if record.stack_info and not message_dict.get("stack_info"):
+            message_dict["stack_info"] = self.formatStack(record.stack_info)
+
+        attrs = record.__dict__
+        log_record = {field: attrs.get(field) for field in FIELDS}
+        log_record.update(message_dict)
+        for key, value in attrs.items():
+            if key not in _SKIP and not key.startswith("_"):
+                log_record[key] = value
+        return _encode_any(log_record)
@@ -0,0 +1,191 @@
+"""
+Asynchronous logging: the handlers configured on the root logger in LOGGING
+are moved behind a bounded in-memory queue and fed by one background
+QueueListener thread, so request threads never wait on formatting or on a
+slow log volume.
+
+When the queue is full, records at or below LOG_QUEUE_DROP_LEVEL (INFO by
+default) are dropped: an incoming one is discarded, and a more severe one
+evicts the oldest lowest-level record in the queue. ERROR and above are
+never dropped; if nothing can be evicted they are queued past the bound.
+Dropped records are counted per level (see stats()).
+
+install() runs from InvitationsConfig.ready(). The listener is restarted in
+forked children and flushed by stop(), which runs at interpreter exit and
+from the celery worker shutdown signals.
+"""
+
+import atexit
+import copy
+import logging
+import os
+import threading
+from collections import Counter, deque
+from logging.handlers import QueueHandler, QueueListener
+
+from django.conf import settings
+
+# never droppable, whatever LOG_QUEUE_DROP_LEVEL says
+MAX_DROP_LEVEL = logging.WARNING
+
+_state = {"handler": None, "listener": None}
+_state_lock = threading.Lock()
+
+
+class DroppingQueue:
+    """
+    Bounded FIFO implementing the parts of queue.Queue that QueueHandler
+    and QueueListener use, with the overflow policy described above.
+    """
+
+    def __init__(self, maxsize: int, drop_level: int):
+        self.maxsize = maxsize
+        self.drop_level = min(drop_level, MAX_DROP_LEVEL)
+        self.dropped = Counter()
+        self._records = deque()
+        self._not_empty = threading.Condition(threading.Lock())
+
+    def put_nowait(self, record):
+        with self._not_empty:
+            if len(self._records) >= self.maxsize and not self._make_room(record):
+                self.dropped[record.levelname] += 1
+                return
+            self._records.append(record)
+            self._not_empty.notify()
+
+    def _make_room(self, record) -> bool:
+        # the listener's stop sentinel is not a record and always goes in
+        level = getattr(record, "levelno", logging.CRITICAL + 1)
+        if level <= self.drop_level:
+            return False
+
+        victim = None
+        for index, queued in enumerate(self._records):
+            queued_level = getattr(queued, "levelno", logging.CRITICAL + 1)
+            if queued_level <= self.drop_level and (
+                victim is None or queued_level < self._records[victim].levelno
+            ):
+                victim = index
+        if victim is not None:
+            self.dropped[self._records[victim].levelname] += 1
+            del self._records[victim]
+        return True
+
+    def get(self, block=True):
+        with self._not_empty:
+            while not self._records:
+                self._not_empty.wait()
+            return self._records.popleft()
+
+    def qsize(self) -> int:
+        return len(self._records)
+
+
+class LogQueueHandler(QueueHandler):
+    def prepare(self, record):
+        # Merge args into the message now, while they are still valid, but
+        # keep the traceback apart from it so formatters downstream render
+        # exc_info exactly as they would have synchronously.
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def install():
+    """
+    Move the root logger's handlers behind the queue. Their filters move to
+    the queue handler so they keep running on the calling thread, where the
+    request context is.
+    """
+    if not getattr(settings, "LOG_QUEUE_ENABLED", True):
+        return
+
+    with _state_lock:
+        if _state["listener"] is not None:
+            return
+        root = logging.getLogger()
+        targets = [h for h in root.handlers if not isinstance(h, QueueHandler)]
+        if not targets:
+            return
+
+        handler = LogQueueHandler(_new_queue())
+        for target in targets:
+            for log_filter in list(target.filters):
+                if log_filter not in handler.filters:
+                    handler.addFilter(log_filter)
+                target.removeFilter(log_filter)
+            root.removeHandler(target)
+        root.addHandler(handler)
+
+        listener = QueueListener(handler.queue, *targets, respect_handler_level=True)
+        listener.start()
+        _state.update(handler=handler, listener=listener)
+
+
+def _new_queue() -> DroppingQueue:
+    return DroppingQueue(
+        maxsize=getattr(settings, "LOG_QUEUE_SIZE", 10000),
+        drop_level=logging.getLevelName(
+            getattr(settings, "LOG_QUEUE_DROP_LEVEL", "INFO")
+        ),
+    )
+
+
+def stop():
+    """
+    Write out everything still queued and stop the listener; idempotent.
+    """
+    with _state_lock:
+        listener, handler = _state["listener"], _state["handler"]
+        if listener is None:
+            return
+        _state["listener"] = None
+        listener.stop()
+
+        # the listener is gone; put the handlers back on the root logger so
+        # records logged during the rest of shutdown are still written
+        root = logging.getLogger()
+        root.removeHandler(handler)
+        for target in listener.handlers:
+            for log_filter in handler.filters:
+                target.addFilter(log_filter)
+            root.addHandler(target)
+
+    dropped = handler.queue.dropped
+    if dropped:
+        logging.getLogger(__name__).warning(
+            "Log queue overflow dropped %d records (%s)",
+            sum(dropped.values()),
+            ", ".join(f"{level}: {count}" for level, count in sorted(dropped.items())),
+        )
+
+
+def stats() -> dict:
+    handler = _state["handler"]
+    if handler is None:
+        return {"queued": 0, "dropped": {}}
+    return {"queued": handler.queue.qsize(), "dropped": dict(handler.queue.dropped)}
+
+
+def _restart_in_child():
+    # the listener thread does not survive fork, and the queue's lock may
+    # have been held by another thread at fork time: start over
+    global _state_lock
+    _state_lock = threading.Lock()
+    listener = _state["listener"]
+    if listener is None:
+        return
+    queue = _new_queue()
+    _state["handler"].queue = queue
+    listener.queue = queue
+    listener.start()
+
+
+atexit.register(stop)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_in_child)
@@ -1,13 +1,24 @@
 import logging
 from django.conf import settings
 
+from invitations import log_context
+
 
 class RequestContextFilter(logging.Filter):
+    def __init__(self, name=""):
+        super().__init__(name)
+        self.service = getattr(settings, "SERVICE_NAME", "unknown")
+
     def filter(self, record):
-        record.service = getattr(settings, "SERVICE_NAME", "unknown")
+        record.service = self.service
 
-        record.trace_id = getattr(record, "trace_id", None)
-        record.user_id = getattr(record, "user_id", None)
-        record.tenant_id = getattr(record, "tenant_id", None)
+        # explicit `extra` values win over the request/task context
+        attrs = record.__dict__
+        if "trace_id" not in attrs:
+            record.trace_id = log_context.trace_id.get()
+        if "user_id" not in attrs:
+            record.user_id = log_context.user_id.get()
+        if "tenant_id" not in attrs:
+            record.tenant_id = log_context.tenant_id.get()
 
         return True
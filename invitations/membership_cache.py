@@ -0,0 +1,97 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from invitations.metrics import record_membership_cache
+from invitations.models import TenantMember
+
+MEMBERSHIP_PREFIX = "membership"
+
+# Cached for users that are not members, so repeated lookups for unknown
+# (tenant, user) pairs are answered without a query.
+NOT_A_MEMBER = ""
+
+
+def _ttl() -> int:
+    return getattr(settings, "MEMBERSHIP_CACHE_TTL", 300)
+
+
+def _version_key(tenant_id):
+    return f"{MEMBERSHIP_PREFIX}:version:{tenant_id}"
+
+
+def _member_key(tenant_id, user_id, version):
+    return f"{MEMBERSHIP_PREFIX}:{tenant_id}:{version}:{user_id}"
+
+
+def _tenant_version(tenant_id) -> int:
+    key = _version_key(tenant_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, 1, timeout=None)
+        version = cache.get(key, 1)
+    return version
+
+
+def get_role(tenant_id: int, user_id: int):
+    """
+    Return the user's role in the tenant, or None if they are not a member.
+    """
+    key = _member_key(tenant_id, user_id, _tenant_version(tenant_id))
+    role = cache.get(key)
+    if role is not None:
+        record_membership_cache(hit=True)
+        return role or None
+
+    record_membership_cache(hit=False)
+    role = (
+        TenantMember.objects.filter(tenant_id=tenant_id, user_id=user_id)
+        .values_list("role", flat=True)
+        .first()
+    )
+    cache.set(key, role or NOT_A_MEMBER, timeout=_ttl())
+    return role
+
+
+async def _atenant_version(tenant_id) -> int:
+    key = _version_key(tenant_id)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, 1, timeout=None)
+        version = await cache.aget(key, 1)
+    return version
+
+
+async def aget_role(tenant_id: int, user_id: int):
+    """
+    Async variant of get_role for ASGI views.
+    """
+    key = _member_key(tenant_id, user_id, await _atenant_version(tenant_id))
+    role = await cache.aget(key)
+    if role is not None:
+        record_membership_cache(hit=True)
+        return role or None
+
+    record_membership_cache(hit=False)
+    role = await (
+        TenantMember.objects.filter(tenant_id=tenant_id, user_id=user_id)
+        .values_list("role", flat=True)
+        .afirst()
+    )
+    await cache.aset(key, role or NOT_A_MEMBER, timeout=_ttl())
+    return role
+
+
+def forget(tenant_id: int, user_id: int):
+    cache.delete(_member_key(tenant_id, user_id, _tenant_version(tenant_id)))
+
+
+def flush_tenant(tenant_id: int):
+    """
+    Invalidate every cached membership of a tenant by bumping its version.
+    Old entries are never read again and age out through their TTL.
+    """
+    try:
+        cache.incr(_version_key(tenant_id))
+    except ValueError:
+        cache.set(_version_key(tenant_id), 2, timeout=None)
+
@@ -0,0 +1,197 @@
+"""
+Prometheus metrics for the API and its outbound calls, served as text at
+/metrics.
+
+MetricsMiddleware records, per route (the URL pattern, so ids in the path do
+not multiply the series), the request count by method and status class, a
+latency histogram, and how many DB queries each request ran and for how
+long. call_external_service records outbound latency per domain and outcome
+and the circuit state it last saw, and the read caches count their hits,
+misses and what the 304s saved.
+
+With several worker processes, set PROMETHEUS_MULTIPROC_DIR to an empty,
+writable directory before they start (entrypoint.sh wipes it): every process
+then writes its values to its own mmap'd files and /metrics sums them, so
+any worker can answer the scrape. Without it the values are per process.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+from .circuit_breaker import CLOSED, HALF_OPEN, OPEN
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+UNMATCHED_ROUTE = "<unmatched>"
+METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+CIRCUIT_STATES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+REQUESTS = Counter(
+    "http_requests",
+    "HTTP requests by route, method and status class.",
+    ["route", "method", "status"],
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route and method.",
+    ["route", "method"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries",
+    "Database queries run per request, by route.",
+    ["route"],
+    buckets=QUERY_COUNT_BUCKETS,
+)
+REQUEST_QUERY_TIME = Histogram(
+    "http_request_db_duration_seconds",
+    "Time spent in database queries per request, by route.",
+    ["route"],
+    buckets=LATENCY_BUCKETS,
+)
+OUTBOUND_LATENCY = Histogram(
+    "outbound_request_duration_seconds",
+    "call_external_service attempt latency by domain and outcome.",
+    ["domain", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+CIRCUIT_STATE = Gauge(
+    "outbound_circuit_state",
+    "Circuit state last seen per domain: 0 closed, 1 half-open, 2 open.",
+    ["domain"],
+    multiprocess_mode="mostrecent",
+)
+MEMBERSHIP_CACHE_LOOKUPS = Counter(
+    "membership_cache_lookups",
+    "membership_cache role lookups by result (hit, miss).",
+    ["result"],
+)
+RESPONSE_CACHE_LOOKUPS = Counter(
+    "response_cache_lookups",
+    "cached_response lookups by endpoint and result (hit, miss).",
+    ["endpoint", "result"],
+)
+RESPONSE_CACHE_NOT_MODIFIED = Counter(
+    "response_cache_not_modified",
+    "Cached responses answered with 304 Not Modified, by endpoint.",
+    ["endpoint"],
+)
+RESPONSE_CACHE_BYTES_SAVED = Counter(
+    "response_cache_bytes_saved",
+    "Body bytes not sent thanks to 304 Not Modified, by endpoint.",
+    ["endpoint"],
+)
+
+# labels() takes the metric's lock; the children are looked up here instead,
+# so the hot path is a dict hit and the value update
+_children = {}
+
+_query_usage = ContextVar("query_usage", default=None)
+
+
+def _child(metric, *labels):
+    key = (metric, labels)
+    child = _children.get(key)
+    if child is None:
+        child = _children[key] = metric.labels(*labels)
+    return child
+
+
+class QueryUsage:
+    __slots__ = ("queries", "seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+def _observe_query(execute, sql, params, many, context):
+    usage = _query_usage.get()
+    if usage is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        usage.queries += 1
+        usage.seconds += time.perf_counter() - started
+
+
+def _install_query_observer(sender, connection, **kwargs):
+    # Every connection, in whatever thread opens it, reports to the usage in
+    # the current context; sync_to_async copies the context, so queries run
+    # on behalf of async views are counted too. Inserted first because
+    # connection.execute_wrapper() pops the last wrapper on exit.
+    if _observe_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _observe_query)
+
+
+connection_created.connect(_install_query_observer)
+
+
+@contextmanager
+def track_queries():
+    usage = QueryUsage()
+    token = _query_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _query_usage.reset(token)
+
+
+def record_request(request, response, seconds: float, usage: QueryUsage):
+    match = getattr(request, "resolver_match", None)
+    route = match.route if match is not None else UNMATCHED_ROUTE
+    method = request.method if request.method in METHODS else "other"
+    status_class = f"{response.status_code // 100}xx"
+
+    _child(REQUESTS, route, method, status_class).inc()
+    _child(REQUEST_LATENCY, route, method).observe(seconds)
+    _child(REQUEST_QUERIES, route).observe(usage.queries)
+    _child(REQUEST_QUERY_TIME, route).observe(usage.seconds)
+
+
+def record_outbound(domain: str, seconds: float, outcome: str):
+    _child(OUTBOUND_LATENCY, domain, outcome).observe(seconds)
+
+
+def record_circuit_state(domain: str, state: str):
+    _child(CIRCUIT_STATE, domain).set(CIRCUIT_STATES[state])
+
+
+def record_membership_cache(hit: bool):
+    _child(MEMBERSHIP_CACHE_LOOKUPS, "hit" if hit else "miss").inc()
+
+
+def record_response_cache(endpoint: str, hit: bool):
+    _child(RESPONSE_CACHE_LOOKUPS, endpoint, "hit" if hit else "miss").inc()
+
+
+def record_not_modified(endpoint: str, size: int):
+    _child(RESPONSE_CACHE_NOT_MODIFIED, endpoint).inc()
+    _child(RESPONSE_CACHE_BYTES_SAVED, endpoint).inc(size)
+
+
+def metrics_view(request):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
@@ -1,17 +1,82 @@
+import time
 import uuid
 import logging
-from django.utils.deprecation import MiddlewareMixin
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from invitations import log_context, metrics, tenant_context
 
 logger = logging.getLogger(__name__)
 
 
-class TraceIDMiddleware(MiddlewareMixin):
+class MetricsMiddleware:
+    """
+    Records per-route request count, status class and latency, and the DB
+    queries each request ran (see invitations.metrics). First in MIDDLEWARE
+    so the latency covers the whole stack. Off when METRICS_ENABLED is False.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "METRICS_ENABLED", True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        with metrics.track_queries() as usage:
+            response = self.get_response(request)
+        metrics.record_request(request, response, time.perf_counter() - started, usage)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        with metrics.track_queries() as usage:
+            response = await self.get_response(request)
+        metrics.record_request(request, response, time.perf_counter() - started, usage)
+        return response
+
+
+class TraceIDMiddleware:
     """
     - Reads X-Trace-ID header if present
     - Otherwise generates a new trace_id
-    - Attaches it to request and logging context
+    - Attaches it to the request and binds it in log_context for the rest
+      of the request
+
+    Sync and async capable, so under ASGI it does not cost a thread hop.
     """
 
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        self.process_request(request)
+        with log_context.bound(trace_id=request.trace_id):
+            response = self.get_response(request)
+        return self.process_response(request, response)
+
+    async def __acall__(self, request):
+        self.process_request(request)
+        with log_context.bound(trace_id=request.trace_id):
+            response = await self.get_response(request)
+        return self.process_response(request, response)
+
     def process_request(self, request):
         trace_id = request.headers.get("X-Trace-ID", str(uuid.uuid4()))
         request.trace_id = trace_id
@@ -21,3 +86,33 @@ class TraceIDMiddleware(MiddlewareMixin):
         if trace_id:
             response["X-Trace-ID"] = trace_id
         return response
+
+
+class TenantContextMiddleware:
+    """
+    Parses X-Tenant-ID once and attaches the lazily resolved tenant and
+    membership to the request (see invitations.tenant_context), and binds
+    the tenant id in log_context. user_id is bound later, by whichever layer
+    authenticates the caller, and cleared with the tenant at the end. Must
+    come after AuthenticationMiddleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        tenant_context.attach(request)
+        with log_context.bound(tenant_id=request.tenant_id, user_id=None):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        tenant_context.attach(request)
+        with log_context.bound(tenant_id=request.tenant_id, user_id=None):
+            return await self.get_response(request)
@@ -14,23 +14,10 @@ class ExternalServiceCircuitBreakerMiddleware(MiddlewareMixin):
     Blocks outbound calls when circuit is OPEN.
     """
 
-    def process_request(self, request):
-
-        pass
-
     @staticmethod
     def block_if_open(domain: str, request):
         if is_circuit_open(domain):
-            logger.warning(
-                "Circuit open – outbound request blocked",
-                extra={
-                    "trace_id": getattr(request, "trace_id", None),
-                    "user_id": (
-                        request.user.id if request.user.is_authenticated else None
-                    ),
-                    "tenant_id": getattr(request, "tenant_id", None),
-                },
-            )
+            logger.warning("Circuit open – outbound request blocked")
             raise ExternalServiceBlocked(f"Circuit open for {domain}")
 
 
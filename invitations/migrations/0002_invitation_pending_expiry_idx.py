@@ -0,0 +1,20 @@
+# Generated by Django 5.2.8 on 2026-10-18 17:13
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # build the index without locking writes on a large invitations table
+    atomic = False
+
+    dependencies = [
+        ('invitations', '0001_initial'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='invitation',
+            index=models.Index(condition=models.Q(('status', 'Pending')), fields=['expiration_date', 'id'], name='invitation_pending_expiry_idx'),
+        ),
+    ]
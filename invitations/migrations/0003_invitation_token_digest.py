@@ -0,0 +1,49 @@
+# Generated by Django 5.2.8 on 2026-10-18 17:40
+
+import hashlib
+
+from django.db import migrations, models, transaction
+
+BATCH_SIZE = 5000
+
+
+def backfill_token_digests(apps, schema_editor):
+    # one short transaction per batch, walking the primary key, so a large
+    # table is never locked for the whole backfill
+    Invitation = apps.get_model('invitations', 'Invitation')
+    last_id = 0
+    while True:
+        rows = list(
+            Invitation.objects.filter(id__gt=last_id, token_digest__isnull=True)
+            .order_by('id')
+            .values_list('id', 'token')[:BATCH_SIZE]
+        )
+        if not rows:
+            return
+        with transaction.atomic():
+            Invitation.objects.bulk_update(
+                [
+                    Invitation(id=pk, token_digest=hashlib.sha256(token.encode()).digest())
+                    for pk, token in rows
+                ],
+                ['token_digest'],
+            )
+        last_id = rows[-1][0]
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('invitations', '0002_invitation_pending_expiry_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invitation',
+            name='token_digest',
+            field=models.BinaryField(editable=False, max_length=32, null=True),
+        ),
+        # raw tokens cannot be recovered from their digests
+        migrations.RunPython(backfill_token_digests, elidable=True),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.8 on 2026-10-18 17:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invitations', '0003_invitation_token_digest'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='invitation',
+            name='token',
+        ),
+        migrations.AlterField(
+            model_name='invitation',
+            name='token_digest',
+            field=models.BinaryField(editable=False, max_length=32),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-18 17:40
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # build the index without locking writes on a large invitations table
+    atomic = False
+
+    dependencies = [
+        ('invitations', '0004_remove_invitation_token'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='invitation',
+            index=django.contrib.postgres.indexes.HashIndex(fields=['token_digest'], name='invitation_token_digest_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.8 on 2026-10-18 17:22
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # build the index without locking writes on a large invitations table
+    atomic = False
+
+    dependencies = [
+        ('invitations', '0005_invitation_token_digest_idx'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='invitation',
+            index=models.Index(fields=['tenant', '-created_at', '-id'], include=('status', 'name', 'email', 'expiration_date'), name='invitation_tenant_list_idx'),
+        ),
+    ]
@@ -1,5 +1,7 @@
 from django.conf import settings
+from django.contrib.postgres.indexes import HashIndex
 from django.db import models
+import hashlib
 import secrets
 from datetime import timedelta
 from django.utils import timezone
@@ -52,7 +54,8 @@ class Invitation(models.Model):
         max_length=20, choices=Status.choices, default=Status.PENDING
     )
 
-    token = models.CharField(max_length=128, unique=True, db_index=True)
+    # SHA-256 of the emailed token; the raw token is never stored
+    token_digest = models.BinaryField(max_length=32, editable=False)
     expiration_date = models.DateTimeField()
     invited_ip = models.GenericIPAddressField(null=True, blank=True)
     note = models.TextField(blank=True, default="")
@@ -64,11 +67,34 @@ class Invitation(models.Model):
         indexes = [
             models.Index(fields=["email", "tenant"]),
             models.Index(fields=["status", "expiration_date"]),
+            # keyset order for the expire_invitations sweep
+            models.Index(
+                fields=["expiration_date", "id"],
+                condition=models.Q(status="Pending"),
+                name="invitation_pending_expiry_idx",
+            ),
+            # equality lookups only; 256-bit random tokens make a unique
+            # constraint (and its second B-tree) unnecessary
+            HashIndex(fields=["token_digest"], name="invitation_token_digest_idx"),
+            # keyset pages of the tenant invitation list (invitations.listing);
+            # `note` is left out as unbounded text
+            models.Index(
+                fields=["tenant", "-created_at", "-id"],
+                include=["status", "name", "email", "expiration_date"],
+                name="invitation_tenant_list_idx",
+            ),
         ]
 
     def __str__(self):
         return f"{self.email} ({self.tenant_id}) - {self.status}"
 
+    def save(self, *args, **kwargs):
+        # creation paths that never set a token (e.g. the admin) would store
+        # an empty digest that no token can match
+        if not self.token_digest:
+            self.token = self.generate_token()
+        super().save(*args, **kwargs)
+
     @staticmethod
     def default_expiry():
         return timezone.now() + timedelta(days=7)
@@ -77,6 +103,23 @@ class Invitation(models.Model):
     def generate_token():
         return secrets.token_urlsafe(32)
 
+    @staticmethod
+    def digest_token(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    @property
+    def token(self):
+        """
+        The raw token, only known to the instance that generated it (for the
+        invitation email); loaded instances return None.
+        """
+        return getattr(self, "_token", None)
+
+    @token.setter
+    def token(self, value):
+        self._token = value
+        self.token_digest = self.digest_token(value)
+
     @property
     def is_expired(self) -> bool:
         return timezone.now() >= self.expiration_date
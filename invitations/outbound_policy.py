@@ -0,0 +1,95 @@
+"""
+In-process retry and hedging policy for call_external_service.
+
+- LatencyTracker keeps the last LATENCY_SAMPLES latencies per domain and
+  answers percentile queries (used to time hedged requests).
+- RetryBudget caps retries and hedges per domain to a fraction of normal
+  traffic, so retries cannot multiply load on a struggling service.
+"""
+
+import random
+import threading
+from collections import deque
+
+from django.conf import settings
+
+LATENCY_SAMPLES = 512
+# Don't hedge until a domain has this many samples to estimate p95 from.
+MIN_SAMPLES_FOR_HEDGE = 20
+
+
+class LatencyTracker:
+    def __init__(self, samples: int = LATENCY_SAMPLES):
+        self._samples = samples
+        self._lock = threading.Lock()
+        self._latencies = {}
+
+    def record(self, domain: str, seconds: float):
+        with self._lock:
+            window = self._latencies.get(domain)
+            if window is None:
+                window = self._latencies[domain] = deque(maxlen=self._samples)
+            window.append(seconds)
+
+    def percentile(self, domain: str, pct: float, min_samples: int = 1):
+        with self._lock:
+            window = self._latencies.get(domain)
+            if not window or len(window) < min_samples:
+                return None
+            ordered = sorted(window)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            domains = list(self._latencies)
+        return {
+            domain: {
+                "p50": self.percentile(domain, 50),
+                "p95": self.percentile(domain, 95),
+                "p99": self.percentile(domain, 99),
+            }
+            for domain in domains
+        }
+
+
+class RetryBudget:
+    """
+    Token bucket per domain: every request deposits `ratio` tokens, every
+    retry or hedge withdraws one. The bucket starts full at `minimum` so
+    low-traffic domains can still retry a little.
+    """
+
+    def __init__(self, ratio: float, minimum: int):
+        self.ratio = ratio
+        self.minimum = minimum
+        self._lock = threading.Lock()
+        self._tokens = {}
+
+    def deposit(self, domain: str):
+        with self._lock:
+            tokens = self._tokens.get(domain, self.minimum)
+            self._tokens[domain] = min(tokens + self.ratio, self.minimum)
+
+    def withdraw(self, domain: str) -> bool:
+        with self._lock:
+            tokens = self._tokens.get(domain, self.minimum)
+            if tokens < 1:
+                return False
+            self._tokens[domain] = tokens - 1
+            return True
+
+
+def backoff_delay(attempt: int) -> float:
+    """
+    Full-jitter exponential backoff for the given retry attempt (1-based).
+    """
+    base = getattr(settings, "HTTP_CLIENT_RETRY_BACKOFF", 0.1)
+    cap = getattr(settings, "HTTP_CLIENT_RETRY_BACKOFF_MAX", 2.0)
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+latency_tracker = LatencyTracker()
+retry_budget = RetryBudget(
+    ratio=getattr(settings, "HTTP_CLIENT_RETRY_BUDGET_RATIO", 0.1),
+    minimum=getattr(settings, "HTTP_CLIENT_RETRY_BUDGET_MIN", 10),
+)
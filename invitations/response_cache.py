@@ -0,0 +1,111 @@
+"""
+Shared cache for read endpoints whose response depends only on the tenant
+and the caller's role.
+
+Entries are keyed by endpoint, tenant, role, the tenant's response version
+and the permission index version, so a membership change in the tenant
+(flush_tenant) or any PermissionRule change (permission_index.invalidate)
+makes the old entries unreachable; they age out through RESPONSE_CACHE_TTL.
+
+Each entry holds the payload and a strong ETag over its canonical JSON. A
+matching If-None-Match is answered with 304 before the view runs. Hits,
+misses, 304s and the bytes they saved are exported through
+invitations.metrics.
+"""
+
+import hashlib
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_vary_headers
+from rest_framework import status
+from rest_framework.response import Response
+
+from permissions_app.permission_index import INDEX_VERSION_KEY
+
+from .metrics import record_not_modified, record_response_cache
+
+RESPONSE_PREFIX = "response"
+
+
+def _ttl() -> int:
+    return getattr(settings, "RESPONSE_CACHE_TTL", 300)
+
+
+def _version_key(tenant_id):
+    return f"{RESPONSE_PREFIX}:version:{tenant_id}"
+
+
+def _entry_key(endpoint, tenant_id, role):
+    versions = cache.get_many([_version_key(tenant_id), INDEX_VERSION_KEY])
+    return (
+        f"{RESPONSE_PREFIX}:{endpoint}:{tenant_id}:{role}:"
+        f"{versions.get(_version_key(tenant_id), 1)}:"
+        f"{versions.get(INDEX_VERSION_KEY, 1)}"
+    )
+
+
+def _etag_matches(request, etag) -> bool:
+    if_none_match = request.headers.get("If-None-Match", "")
+    return etag in [tag.strip() for tag in if_none_match.split(",")]
+
+
+def _respond(request, endpoint, entry):
+    if _etag_matches(request, entry["etag"]):
+        record_not_modified(endpoint, entry["size"])
+        response = Response(
+            status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": entry["etag"]}
+        )
+    else:
+        response = Response(entry["data"], headers={"ETag": entry["etag"]})
+    patch_vary_headers(response, ["X-Tenant-ID", "Authorization", "Cookie"])
+    return response
+
+
+def cached_response(endpoint: str):
+    """
+    Cache a DRF GET handler's 200 responses per (tenant, role). Apply it
+    below check_permission, which sets request.tenant_id and request.role.
+    """
+
+    def decorator(view_method):
+        @wraps(view_method)
+        def _wrapped(self, request, *args, **kwargs):
+            key = _entry_key(endpoint, request.tenant_id, request.role)
+            entry = cache.get(key)
+            if entry is not None:
+                record_response_cache(endpoint, hit=True)
+                return _respond(request, endpoint, entry)
+
+            record_response_cache(endpoint, hit=False)
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+
+            body = json.dumps(
+                response.data, sort_keys=True, separators=(",", ":")
+            ).encode()
+            entry = {
+                "etag": f'"{hashlib.sha256(body).hexdigest()[:32]}"',
+                "data": response.data,
+                "size": len(body),
+            }
+            cache.set(key, entry, timeout=_ttl())
+            return _respond(request, endpoint, entry)
+
+        return _wrapped
+
+    return decorator
+
+
+def flush_tenant(tenant_id: int):
+    """
+    Invalidate every cached response of a tenant by bumping its version.
+    """
+    try:
+        cache.incr(_version_key(tenant_id))
+    except ValueError:
+        cache.set(_version_key(tenant_id), 2, timeout=None)
+
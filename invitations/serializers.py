@@ -1,9 +1,14 @@
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Exists, OuterRef
 from django.utils import timezone
 from rest_framework import serializers
 
-from .models import Invitation, Tenant, TenantMember
+from accounts.password_hashing import hash_password
 
+from . import membership_cache, response_cache
+from .models import Invitation, Tenant, TenantMember
 
 User = get_user_model()
 
@@ -12,13 +17,27 @@ class InvitationCreateSerializer(serializers.Serializer):
     email = serializers.EmailField()
     note = serializers.CharField(required=False, allow_blank=True, default="")
 
-    def create(self, validated_data):
+    def pending_invites(self):
+        """
+        The tenant's pending invitations for this email, served by the
+        (email, tenant) index; creating another would only resend a token.
+        """
+        return Invitation.objects.filter(
+            tenant=self.context["tenant"],
+            email=self.validated_data["email"].lower(),
+            status=Invitation.Status.PENDING,
+        )
+
+    def build(self, validated_data):
+        """
+        Return an unsaved Invitation, so async callers can `await asave()`.
+        """
         tenant = self.context["tenant"]
         ip = self.context.get("ip")
         email = validated_data["email"].lower()
         note = validated_data.get("note", "")
         name = email.split("@")[0]
-        invite = Invitation.objects.create(
+        return Invitation(
             tenant=tenant,
             name=name,
             email=email,
@@ -28,10 +47,21 @@ class InvitationCreateSerializer(serializers.Serializer):
             invited_ip=ip,
             note=note,
         )
+
+    def create(self, validated_data):
+        invite = self.build(validated_data)
+        invite.save()
         return invite
 
 
 class InvitationSerializer(serializers.ModelSerializer):
+    def __init__(self, *args, fields=None, **kwargs):
+        # optional projection: only serialize (and so only load) these fields
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
     class Meta:
         model = Invitation
         fields = [
@@ -47,44 +77,100 @@ class InvitationSerializer(serializers.ModelSerializer):
 
 
 class InvitationAcceptSerializer(serializers.Serializer):
+    """
+    Accepts an invitation in a fixed number of queries:
+
+    1. validate(): read-only token lookup, so bad tokens fail before any
+       password hashing; it also notes whether the invited email already
+       has a user (user_exists).
+    2. save(): for a new user, hash the password outside the transaction
+       (in the hashing pool, see accounts.password_hashing); existing users
+       keep theirs, so nothing is hashed. Then in one atomic
+       block re-read the invite with SELECT ... FOR UPDATE (serialising
+       concurrent accepts of the same token), upsert the user and the
+       membership with INSERT ... ON CONFLICT, and mark the invite Accepted.
+    """
+
     token = serializers.CharField()
     password = serializers.CharField(min_length=8, write_only=True)
 
-    def validate(self, attrs):
-        try:
-            invite = Invitation.objects.get(token=attrs["token"])
-        except Invitation.DoesNotExist:
-            raise serializers.ValidationError({"token": "Invalid token"})
-
+    @staticmethod
+    def _check_pending(invite):
         if invite.status != Invitation.Status.PENDING:
             raise serializers.ValidationError(
                 {"token": f"Invitation is {invite.status}, not Pending"}
             )
 
+        # the expiry scheduler persists the Expired status; don't write here
         if timezone.now() >= invite.expiration_date:
-            invite.status = Invitation.Status.EXPIRED
-            invite.save(update_fields=["status", "updated_at"])
             raise serializers.ValidationError({"token": "Invitation expired"})
 
-        attrs["invite"] = invite
+    def validate(self, attrs):
+        try:
+            invite = (
+                Invitation.objects.only("id", "status", "expiration_date")
+                .annotate(
+                    user_exists=Exists(User.objects.filter(email=OuterRef("email")))
+                )
+                .get(token_digest=Invitation.digest_token(attrs["token"]))
+            )
+        except Invitation.DoesNotExist:
+            raise serializers.ValidationError({"token": "Invalid token"})
+
+        self._check_pending(invite)
+        self.user_exists = invite.user_exists
         return attrs
 
-    def save(self, **kwargs):
-        invite = self.validated_data["invite"]
-        password = self.validated_data["password"]
+    def save(self, password_hash=None, **kwargs):
+        # async callers hash with ahash_password() and pass the result in
+        if password_hash is None and not self.user_exists:
+            password_hash = hash_password(self.validated_data["password"])
+
+        with transaction.atomic():
+            try:
+                invite = (
+                    Invitation.objects.select_for_update(of=("self",))
+                    .select_related("tenant")
+                    .get(
+                        token_digest=Invitation.digest_token(
+                            self.validated_data["token"]
+                        )
+                    )
+                )
+            except Invitation.DoesNotExist:
+                raise serializers.ValidationError({"token": "Invalid token"})
+            self._check_pending(invite)
+
+            # existing users keep their password; only the no-op email update
+            # runs on conflict, so RETURNING yields the id either way. If the
+            # user was deleted since validate(), it is created with an
+            # unusable password rather than hashing inside the transaction.
+            (user,) = User.objects.bulk_create(
+                [
+                    User(
+                        email=invite.email,
+                        name=invite.name,
+                        password=password_hash or make_password(None),
+                    )
+                ],
+                update_conflicts=True,
+                unique_fields=["email"],
+                update_fields=["email"],
+            )
 
-        user, created = User.objects.get_or_create(
-            username=invite.email,
-            defaults={"email": invite.email, "first_name": invite.name},
-        )
-        if created:
-            user.set_password(password)
-            user.save()
-        else:
-            pass
+            TenantMember.objects.bulk_create(
+                [TenantMember(tenant_id=invite.tenant_id, user_id=user.id)],
+                ignore_conflicts=True,
+            )
+
+            Invitation.objects.filter(pk=invite.pk).update(
+                status=Invitation.Status.ACCEPTED, updated_at=timezone.now()
+            )
 
-        TenantMember.objects.get_or_create(tenant=invite.tenant, user=user)
+            # bulk_create skips post_save, so drop any cached "not a member"
+            # and the tenant's cached responses here
+            tenant_id, user_id = invite.tenant_id, user.id
+            transaction.on_commit(lambda: membership_cache.forget(tenant_id, user_id))
+            transaction.on_commit(lambda: response_cache.flush_tenant(tenant_id))
 
-        invite.status = Invitation.Status.ACCEPTED
-        invite.save(update_fields=["status", "updated_at"])
         return {"user_id": user.id, "tenant_id": invite.tenant_id}
@@ -0,0 +1,14 @@
+from django.core.cache import caches
+from django.core.cache.backends.redis import RedisCache
+
+
+def redis_client():
+    """
+    Return (backend, redis_client) when the default cache is Redis, else
+    (backend, None). Callers build raw keys with backend.make_and_validate_key
+    so they share the cache's prefix and version.
+    """
+    backend = caches["default"]
+    if isinstance(backend, RedisCache):
+        return backend, backend._cache.get_client(write=True)
+    return backend, None
@@ -0,0 +1,29 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from invitations import membership_cache, response_cache, tenant_context
+from invitations.models import Tenant, TenantMember
+
+
+@receiver(post_save, sender=TenantMember)
+@receiver(post_delete, sender=TenantMember)
+def forget_membership(sender, instance, **kwargs):
+    tenant_id, user_id = instance.tenant_id, instance.user_id
+    transaction.on_commit(lambda: membership_cache.forget(tenant_id, user_id))
+    transaction.on_commit(lambda: response_cache.flush_tenant(tenant_id))
+
+
+@receiver(post_delete, sender=Tenant)
+def flush_tenant_memberships(sender, instance, **kwargs):
+    # pk is cleared on the instance once the delete finishes
+    tenant_id = instance.pk
+    transaction.on_commit(lambda: membership_cache.flush_tenant(tenant_id))
+    transaction.on_commit(lambda: response_cache.flush_tenant(tenant_id))
+
+
+@receiver(post_save, sender=Tenant)
+@receiver(post_delete, sender=Tenant)
+def forget_tenant(sender, instance, **kwargs):
+    tenant_id = instance.pk
+    transaction.on_commit(lambda: tenant_context.forget(tenant_id))
@@ -1,19 +1,32 @@
+import json
+import time
+
 from celery import shared_task
 from django.conf import settings
-from django.core.mail import send_mail
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Q
 from django.utils import timezone
+from . import expiry_scheduler, log_context
 from .models import Invitation
+from .shared_cache import redis_client
 
 
 import logging
 
 logger = logging.getLogger(__name__)
 
+OUTBOX_KEY = "invite_email:outbox"
+OUTBOX_FLUSH_KEY = "invite_email:flush_scheduled"
 
-@shared_task
-def send_invitation_email(
-    invite_email: str, invite_name: str, tenant_name: str, token: str
-):
+EXPIRE_LOCK_KEY = "expire_invitations:lock"
+EXPIRE_LOCK_SECONDS = 30 * 60
+EXPIRE_CURSOR_KEY = "expire_invitations:cursor"
+EXPIRE_CURSOR_SECONDS = 24 * 60 * 60
+
+
+def _invitation_message(invite_name: str, tenant_name: str, token: str):
     accept_url = f"{settings.APP_BASE_URL}/api/invitations/accept/"
 
     subject = f"Invitation to join {tenant_name}"
@@ -25,41 +38,255 @@ def send_invitation_email(
         f'Body: {{"token": "{token}", "password": "YOUR_PASSWORD"}}\n\n'
         f"This invite expires in 7 days.\n"
     )
+    return subject, message
+
+
+def _trace_headers(trace_id=None) -> dict:
+    # lets the SMTP/relay logs be joined with the request and task lines
+    trace_id = trace_id or log_context.trace_id.get()
+    return {"X-Trace-ID": trace_id} if trace_id else {}
 
-    logger.info(
-        "Invitation email sent",
-        extra={
-            "trace_id": None,
-            "user_id": None,
-            "tenant_id": None,
-        },
-    )
 
-    send_mail(
+@shared_task
+def send_invitation_email(
+    invite_email: str, invite_name: str, tenant_name: str, token: str
+):
+    subject, message = _invitation_message(invite_name, tenant_name, token)
+
+    logger.info("Invitation email sent")
+
+    EmailMessage(
         subject=subject,
-        message=message,
+        body=message,
         from_email=settings.DEFAULT_FROM_EMAIL,
-        recipient_list=[invite_email],
-        fail_silently=False,
+        to=[invite_email],
+        headers=_trace_headers(),
+    ).send(fail_silently=False)
+
+
+def _invitation_email(invite: dict, connection) -> EmailMessage:
+    subject, message = _invitation_message(
+        invite["name"], invite["tenant_name"], invite["token"]
+    )
+    return EmailMessage(
+        subject=subject,
+        body=message,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[invite["email"]],
+        headers=_trace_headers(invite.get("trace_id")),
+        connection=connection,
     )
 
 
 @shared_task
-def expire_invitations():
-    now = timezone.now()
-    qs = Invitation.objects.filter(
-        status=Invitation.Status.PENDING,
-        expiration_date__lte=now,
+def send_invitation_email_batch(invites: list, attempt: int = 0):
+    """
+    Send many invitation emails over one SMTP connection.
+    Each item: {"email", "name", "tenant_name", "token"}, plus the
+    "trace_id" of the request that queued it when it came from the outbox.
+
+    Sends are paced to INVITE_EMAIL_RATE_PER_SECOND (0 = unpaced). Messages
+    that fail are retried as a new batch with exponential backoff, up to
+    INVITE_EMAIL_MAX_RETRIES times.
+    """
+    max_batch = getattr(settings, "INVITE_EMAIL_BATCH_SIZE", 100)
+    for start in range(max_batch, len(invites), max_batch):
+        send_invitation_email_batch.delay(invites[start : start + max_batch], attempt)
+    invites = invites[:max_batch]
+
+    rate = getattr(settings, "INVITE_EMAIL_RATE_PER_SECOND", 0)
+    interval = 1 / rate if rate else 0
+
+    failed = []
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception:
+        logger.exception("SMTP connection failed")
+        failed = list(invites)
+    else:
+        try:
+            for position, invite in enumerate(invites):
+                started = time.monotonic()
+                try:
+                    connection.send_messages([_invitation_email(invite, connection)])
+                except Exception:
+                    logger.exception("Invitation email failed")
+                    failed.append(invite)
+                    # the session may be unusable after an SMTP error
+                    connection.close()
+                    try:
+                        connection.open()
+                    except Exception:
+                        failed.extend(invites[position + 1 :])
+                        break
+                pause = interval - (time.monotonic() - started)
+                if pause > 0:
+                    time.sleep(pause)
+        finally:
+            connection.close()
+
+    if failed:
+        if attempt < getattr(settings, "INVITE_EMAIL_MAX_RETRIES", 3):
+            send_invitation_email_batch.apply_async(
+                args=[failed],
+                kwargs={"attempt": attempt + 1},
+                countdown=30 * 2**attempt,
+            )
+        else:
+            logger.error("Invitation emails dropped after retries")
+
+    logger.info("Invitation email batch sent")
+    return {"sent": len(invites) - len(failed), "failed": len(failed)}
+
+
+def queue_invitation_email(
+    invite_email: str, invite_name: str, tenant_name: str, token: str
+):
+    """
+    Queue one invitation email for batched delivery.
+
+    With a Redis cache, invites are appended to a shared outbox and a single
+    flush_invitation_outbox task, scheduled INVITE_EMAIL_BATCH_WINDOW_SECONDS
+    after the first one, sends everything queued in that window as batches.
+    Otherwise this falls back to one send_invitation_email task per invite.
+    """
+    window = getattr(settings, "INVITE_EMAIL_BATCH_WINDOW_SECONDS", 0)
+    backend, client = redis_client()
+    if not window or client is None:
+        send_invitation_email.delay(invite_email, invite_name, tenant_name, token)
+        return
+
+    payload = {
+        "email": invite_email,
+        "name": invite_name,
+        "tenant_name": tenant_name,
+        "token": token,
+    }
+    # one outbox flush carries invites from many requests
+    trace_id = log_context.trace_id.get()
+    if trace_id:
+        payload["trace_id"] = trace_id
+    client.rpush(backend.make_and_validate_key(OUTBOX_KEY), json.dumps(payload))
+    # the flag outlives the window only as a safety net if a flush is lost
+    if cache.add(OUTBOX_FLUSH_KEY, True, timeout=window * 10):
+        # not on behalf of this request alone; publish without its context
+        with log_context.bound(trace_id=None, tenant_id=None, user_id=None):
+            flush_invitation_outbox.apply_async(countdown=window)
+
+
+@shared_task
+def flush_invitation_outbox():
+    backend, client = redis_client()
+    if client is None:
+        return 0
+
+    # clear the flag first: anything queued from now on schedules a new flush
+    cache.delete(OUTBOX_FLUSH_KEY)
+    key = backend.make_and_validate_key(OUTBOX_KEY)
+    batch_size = getattr(settings, "INVITE_EMAIL_BATCH_SIZE", 100)
+    total = 0
+    while True:
+        pipe = client.pipeline()
+        pipe.lrange(key, 0, batch_size - 1)
+        pipe.ltrim(key, batch_size, -1)
+        items, _ = pipe.execute()
+        if not items:
+            return total
+        send_invitation_email_batch.delay([json.loads(item) for item in items])
+        total += len(items)
+
+
+def _expiry_cursor_filter(cursor):
+    if cursor is None:
+        return Q()
+    expiration_date, pk = cursor
+    return Q(expiration_date__gt=expiration_date) | Q(
+        expiration_date=expiration_date, id__gt=pk
     )
-    count = qs.update(status=Invitation.Status.EXPIRED)
 
+
+@shared_task
+def expire_invitations(chunk_size: int = None, sleep_seconds: float = None):
+    """
+    Expire past-due pending invitations in short keyset-paginated chunks.
+
+    Rows are walked in (expiration_date, id) order through the partial
+    pending-expiry index, one small UPDATE per chunk, sleeping between
+    chunks so row locks and WAL are spread out. The cursor is checkpointed
+    in the cache after each chunk; an interrupted sweep resumes from it.
+    """
+    chunk_size = chunk_size or getattr(settings, "EXPIRE_INVITATIONS_CHUNK_SIZE", 1000)
+    if sleep_seconds is None:
+        sleep_seconds = getattr(settings, "EXPIRE_INVITATIONS_SLEEP_SECONDS", 0.05)
+
+    if not cache.add(EXPIRE_LOCK_KEY, True, timeout=EXPIRE_LOCK_SECONDS):
+        logger.info("Expired invitations job skipped: already running")
+        return {"expired": 0, "chunks": [], "skipped": True}
+
+    now = timezone.now()
+    cursor = cache.get(EXPIRE_CURSOR_KEY)
+    chunks = []
+    started = time.monotonic()
+    try:
+        while True:
+            chunk_started = time.monotonic()
+            rows = list(
+                Invitation.objects.filter(
+                    _expiry_cursor_filter(cursor),
+                    status=Invitation.Status.PENDING,
+                    expiration_date__lte=now,
+                )
+                .order_by("expiration_date", "id")
+                .values_list("expiration_date", "id")[:chunk_size]
+            )
+            if not rows:
+                break
+
+            with transaction.atomic():
+                count = Invitation.objects.filter(
+                    id__in=[pk for _, pk in rows],
+                    status=Invitation.Status.PENDING,
+                ).update(status=Invitation.Status.EXPIRED, updated_at=now)
+
+            cursor = rows[-1]
+            cache.set(EXPIRE_CURSOR_KEY, cursor, timeout=EXPIRE_CURSOR_SECONDS)
+            chunks.append(
+                {
+                    "rows": count,
+                    "ms": round((time.monotonic() - chunk_started) * 1000, 2),
+                }
+            )
+            if len(rows) < chunk_size:
+                break
+            if sleep_seconds:
+                time.sleep(sleep_seconds)
+
+        # finished a full pass; the next run starts from the beginning
+        cache.delete(EXPIRE_CURSOR_KEY)
+        expiry_scheduler.refill()
+    finally:
+        cache.delete(EXPIRE_LOCK_KEY)
+
+    total = sum(chunk["rows"] for chunk in chunks)
     logger.info(
-        "Expired invitations job executed",
-        extra={
-            "trace_id": None,
-            "user_id": None,
-            "tenant_id": None,
-        },
+        f"Expired invitations job executed: {total} expired in {len(chunks)} chunks",
     )
 
-    return f"Expired {count} invitations"
+    return {
+        "expired": total,
+        "chunks": chunks,
+        "ms": round((time.monotonic() - started) * 1000, 2),
+    }
+
+
+@shared_task
+def expire_due_invitations():
+    """
+    Frequent tick (see CELERY_BEAT_SCHEDULE) expiring invitations whose
+    deadline has just passed. Uses the deadline set when a Redis cache is
+    configured, otherwise the chunked sweep over the partial index.
+    """
+    if expiry_scheduler.available():
+        return expiry_scheduler.expire_due()
+    return expire_invitations(sleep_seconds=0)["expired"]
@@ -0,0 +1,104 @@
+"""
+Per-request tenant context and the shared Tenant cache behind it.
+
+TenantContextMiddleware parses X-Tenant-ID once and attaches:
+
+- request.tenant_id: the parsed id, or None
+- request.tenant_error: (detail, status) when the header is missing or
+  malformed, else None
+- request.tenant: the Tenant, resolved on first use from the shared cache
+  (TENANT_CACHE_TTL), falsy when no such tenant exists
+- request.membership: the caller's role in the tenant, resolved on first use
+  through membership_cache, falsy for non-members and anonymous callers
+
+The lazy attributes do blocking I/O; async views use aget_tenant() and
+membership_cache.aget_role() instead.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import SimpleLazyObject
+from rest_framework import status
+
+from . import membership_cache
+from .models import Tenant
+
+TENANT_PREFIX = "tenant"
+
+# Cached for ids with no tenant, so probing unknown ids stays query-free.
+NO_TENANT = ""
+
+HEADER_MISSING = ("X-Tenant-ID header missing", status.HTTP_400_BAD_REQUEST)
+HEADER_INVALID = ("Invalid X-Tenant-ID header", status.HTTP_400_BAD_REQUEST)
+INVALID_TENANT = ("Invalid tenant", status.HTTP_400_BAD_REQUEST)
+
+
+def _ttl() -> int:
+    return getattr(settings, "TENANT_CACHE_TTL", 300)
+
+
+def _tenant_key(tenant_id):
+    return f"{TENANT_PREFIX}:{tenant_id}"
+
+
+def parse_tenant_id(request):
+    """
+    Return (tenant_id, None) or (None, (detail, status_code)).
+    """
+    tenant_id = request.headers.get("X-Tenant-ID")
+    if not tenant_id:
+        return None, HEADER_MISSING
+    try:
+        return int(tenant_id), None
+    except ValueError:
+        return None, HEADER_INVALID
+
+
+def get_tenant(tenant_id: int):
+    tenant = cache.get(_tenant_key(tenant_id))
+    if tenant is None:
+        tenant = Tenant.objects.filter(id=tenant_id).first()
+        cache.set(_tenant_key(tenant_id), tenant or NO_TENANT, timeout=_ttl())
+    return tenant or None
+
+
+async def aget_tenant(tenant_id: int):
+    tenant = await cache.aget(_tenant_key(tenant_id))
+    if tenant is None:
+        tenant = await Tenant.objects.filter(id=tenant_id).afirst()
+        await cache.aset(_tenant_key(tenant_id), tenant or NO_TENANT, timeout=_ttl())
+    return tenant or None
+
+
+def forget(tenant_id: int):
+    cache.delete(_tenant_key(tenant_id))
+
+
+def tenant_error(request):
+    """
+    (detail, status) when the request names no existing tenant, else None.
+    """
+    if request.tenant_error is not None:
+        return request.tenant_error
+    if not request.tenant:
+        return INVALID_TENANT
+    return None
+
+
+def attach(request):
+    tenant_id, error = parse_tenant_id(request)
+    request.tenant_id = tenant_id
+    request.tenant_error = error
+
+    def membership():
+        # DRF copies the authenticated user onto the Django request, so this
+        # sees token-authenticated callers too
+        if tenant_id is None or not request.user.is_authenticated:
+            return membership_cache.NOT_A_MEMBER
+        role = membership_cache.get_role(tenant_id, request.user.id)
+        return role or membership_cache.NOT_A_MEMBER
+
+    request.tenant = SimpleLazyObject(
+        lambda: get_tenant(tenant_id) if tenant_id is not None else None
+    )
+    request.membership = SimpleLazyObject(membership)
@@ -1,3 +1,566 @@
-from django.test import TestCase
+import logging
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test import AsyncClient, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from prometheus_client import REGISTRY
+
+from accounts.models import User
+from multi_tenant_system import celery
+from permissions_app import permission_index
+from permissions_app.models import PermissionRule
+
+from . import circuit_breaker, http_client, log_context, membership_cache
+from .bulk import CREATED, DUPLICATE, create_bulk_invitations
+from .log_format import JsonFormatter
+from .models import Invitation, Tenant, TenantMember
+from .serializers import InvitationAcceptSerializer
+
+
+class InvitationAcceptQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(name="Acme")
+
+    def _invite(self, token):
+        return Invitation.objects.create(
+            tenant=self.tenant,
+            name="ada",
+            email="ada@example.com",
+            token=token,
+            expiration_date=timezone.now() + timedelta(days=1),
+        )
+
+    def _accept(self, token, password="Secret123!"):
+        serializer = InvitationAcceptSerializer(
+            data={"token": token, "password": password}
+        )
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        return serializer.save()
+
+    def test_accept_query_count(self):
+        self._invite("tok-1")
+        # validate, savepoint, lock invite + tenant, upsert user,
+        # upsert membership, mark accepted, release savepoint
+        with self.assertNumQueries(7):
+            result = self._accept("tok-1")
+
+        self.assertEqual(result["tenant_id"], self.tenant.id)
+        self.assertTrue(
+            TenantMember.objects.filter(
+                tenant=self.tenant, user_id=result["user_id"]
+            ).exists()
+        )
+        invite = Invitation.objects.get(token_digest=Invitation.digest_token("tok-1"))
+        self.assertEqual(invite.status, Invitation.Status.ACCEPTED)
+
+    def test_accept_existing_user_keeps_password(self):
+        self._invite("tok-1")
+        first = self._accept("tok-1")
+        self._invite("tok-2")
+        with self.assertNumQueries(7), mock.patch(
+            "invitations.serializers.hash_password"
+        ) as hash_password:
+            second = self._accept("tok-2", password="Different456!")
+
+        hash_password.assert_not_called()
+
+        self.assertEqual(first["user_id"], second["user_id"])
+        self.assertEqual(User.objects.count(), 1)
+        user = User.objects.get(id=first["user_id"])
+        self.assertTrue(user.check_password("Secret123!"))
+        self.assertFalse(user.check_password("Different456!"))
+
+
+class BulkInviteTests(TestCase):
+    def test_existing_duplicate_pending_invites(self):
+        tenant = Tenant.objects.create(name="Acme")
+        for token in ("tok-1", "tok-2"):
+            Invitation.objects.create(
+                tenant=tenant,
+                name="ada",
+                email="ada@example.com",
+                token=token,
+                expiration_date=timezone.now() + timedelta(days=1),
+            )
+
+        results = create_bulk_invitations(
+            tenant, [("ada@example.com", ""), ("grace@example.com", "")]
+        )
+
+        self.assertEqual([result["status"] for result in results], [DUPLICATE, CREATED])
+
+
+class AsyncViewCsrfTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(name="Acme")
+        cls.user = User.objects.create(email="owner@example.com")
+
+    def setUp(self):
+        patcher = mock.patch("invitations.async_views.queue_invitation_email")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def _create(self, client, **headers):
+        return await client.post(
+            "/api/async/invitations/",
+            {"email": "ada@example.com"},
+            content_type="application/json",
+            headers={"X-Tenant-ID": str(self.tenant.id), **headers},
+        )
+
+    async def test_session_post_without_token_is_rejected(self):
+        client = AsyncClient(enforce_csrf_checks=True)
+        await client.aforce_login(self.user)
+        response = await self._create(client)
+        self.assertEqual(response.status_code, 403)
+        self.assertIn("CSRF Failed", response.json()["detail"])
+
+    async def test_session_post_with_token_is_accepted(self):
+        client = AsyncClient(enforce_csrf_checks=True)
+        await client.aforce_login(self.user)
+        client.cookies["csrftoken"] = token = "a" * 32
+        response = await self._create(client, **{"X-CSRFToken": token})
+        self.assertEqual(response.status_code, 201)
+
+    async def test_retry_after_csrf_failure_runs(self):
+        cache.clear()
+        client = AsyncClient(enforce_csrf_checks=True)
+        await client.aforce_login(self.user)
+        client.cookies["csrftoken"] = token = "a" * 32
+        key = {"Idempotency-Key": "k-csrf"}
+
+        rejected = await self._create(client, **key)
+        retried = await self._create(client, **key, **{"X-CSRFToken": token})
+
+        self.assertEqual(rejected.status_code, 403)
+        self.assertEqual(retried.status_code, 201)
+        self.assertNotIn("Idempotent-Replayed", retried.headers)
+
+    async def test_anonymous_post_needs_no_token(self):
+        response = await self._create(AsyncClient(enforce_csrf_checks=True))
+        self.assertEqual(response.status_code, 201)
+
+
+class DashboardAccessTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(name="Acme")
+        cls.user = User.objects.create(email="outsider@example.com")
+        PermissionRule.objects.create(
+            role="viewer", product_id="abc", feature="dashboard", permission="read"
+        )
+
+    def setUp(self):
+        # the rule is rolled back after the class; keep this process's
+        # compiled index in step with it
+        permission_index.invalidate()
+        self.addCleanup(permission_index.invalidate)
+
+    async def test_async_view_ignores_session_like_sync_view(self):
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        headers = {"X-Tenant-ID": str(self.tenant.id)}
+
+        sync = await client.get("/api/dashboard/", headers=headers)
+        response = await client.get("/api/async/dashboard/", headers=headers)
+
+        self.assertEqual(sync.status_code, 200)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["role"], sync.json()["role"])
+
+
+class InvitationListingAccessTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(name="Acme")
+        PermissionRule.objects.create(
+            role="viewer", product_id="abc", feature="invitations", permission="read"
+        )
+
+    def setUp(self):
+        permission_index.invalidate()
+        self.addCleanup(permission_index.invalidate)
+
+    def test_anonymous_caller_cannot_list(self):
+        response = self.client.get(
+            "/api/invitations/", headers={"X-Tenant-ID": str(self.tenant.id)}
+        )
+        self.assertEqual(response.status_code, 403)
+
+    def test_member_can_list(self):
+        user = User.objects.create(email="owner@example.com")
+        TenantMember.objects.create(tenant=self.tenant, user=user, role="viewer")
+        self.client.force_login(user)
+        response = self.client.get(
+            "/api/invitations/", headers={"X-Tenant-ID": str(self.tenant.id)}
+        )
+        self.assertEqual(response.status_code, 200)
+
+
+class BulkInviteAccessTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(name="Acme")
+        PermissionRule.objects.create(
+            role="admin", product_id="abc", feature="invitations", permission="write"
+        )
+
+    def setUp(self):
+        # user ids are reused after rollback; drop cached memberships
+        cache.clear()
+        permission_index.invalidate()
+        self.addCleanup(permission_index.invalidate)
+
+    def _bulk(self):
+        return self.client.post(
+            "/api/invitations/bulk/",
+            [{"email": "ada@example.com"}],
+            content_type="application/json",
+            headers={"X-Tenant-ID": str(self.tenant.id)},
+        )
+
+    def _login(self, role):
+        user = User.objects.create(email=f"{role}@example.com")
+        TenantMember.objects.create(tenant=self.tenant, user=user, role=role)
+        self.client.force_login(user)
+
+    def test_anonymous_caller_is_rejected(self):
+        self.assertEqual(self._bulk().status_code, 403)
+        self.assertFalse(Invitation.objects.exists())
+
+    def test_member_without_write_is_rejected(self):
+        self._login("viewer")
+        self.assertEqual(self._bulk().status_code, 403)
+        self.assertFalse(Invitation.objects.exists())
+
+    def test_member_with_write_creates(self):
+        self._login("admin")
+        response = self._bulk()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["created"], 1)
+
+
+class InvitationTokenTests(TestCase):
+    def test_save_without_token_generates_one(self):
+        tenant = Tenant.objects.create(name="Acme")
+        invites = [
+            Invitation.objects.create(
+                tenant=tenant,
+                name="ada",
+                email="ada@example.com",
+                expiration_date=timezone.now() + timedelta(days=1),
+            )
+            for _ in range(2)
+        ]
+
+        for invite in invites:
+            self.assertEqual(invite.token_digest, Invitation.digest_token(invite.token))
+        self.assertNotEqual(invites[0].token_digest, invites[1].token_digest)
+
+
+class AsyncIdempotencyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(name="Acme")
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch("invitations.async_views.queue_invitation_email")
+        self.queue_email = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def _create(self, email):
+        return await self.async_client.post(
+            "/api/async/invitations/",
+            {"email": email},
+            content_type="application/json",
+            headers={"X-Tenant-ID": str(self.tenant.id), "Idempotency-Key": "k-1"},
+        )
+
+    async def test_retry_is_replayed(self):
+        first = await self._create("ada@example.com")
+        second = await self._create("ada@example.com")
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.headers["Idempotent-Replayed"], "true")
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(self.queue_email.call_count, 1)
+
+    async def test_key_reused_with_other_body(self):
+        await self._create("ada@example.com")
+        response = await self._create("grace@example.com")
+        self.assertEqual(response.status_code, 422)
+
+
+class TenantContextQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(name="Acme")
+
+    def setUp(self):
+        cache.clear()
+        # keep the broker out of it
+        patcher = mock.patch("invitations.views.queue_invitation_email")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _create(self, email):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                "/api/invitations/",
+                {"email": email},
+                content_type="application/json",
+                headers={"X-Tenant-ID": str(self.tenant.id)},
+            )
+        self.assertEqual(response.status_code, 201)
+        return [q["sql"] for q in queries if '"invitations_tenant"' in q["sql"]]
+
+    def test_tenant_resolved_once_then_cached(self):
+        self.assertEqual(len(self._create("ada@example.com")), 1)
+        self.assertEqual(self._create("grace@example.com"), [])
+
+
+class JsonFormatterCompatTests(SimpleTestCase):
+    def test_matches_python_json_logger(self):
+        from pythonjsonlogger.jsonlogger import JsonFormatter as LegacyJsonFormatter
+
+        legacy = LegacyJsonFormatter(
+            "%(asctime)s %(levelname)s %(name)s %(message)s "
+            "%(service)s %(trace_id)s %(user_id)s %(tenant_id)s"
+        )
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            exc_info = sys.exc_info()
+
+        records = [
+            ("Invitation créé %s", ("ada",), None, {"trace_id": "t", "user_id": 1}),
+            ("failed", None, exc_info, {"tenant_id": 7, "status_code": 500}),
+            ({"event": "sync"}, None, None, {"service": "svc"}),
+        ]
+        for msg, args, exc, extra in records:
+            record = logging.LogRecord(
+                "invitations", logging.INFO, "", 1, msg, args, exc
+            )
+            record.__dict__.update(extra)
+            expected = legacy.format(logging.makeLogRecord(record.__dict__))
+            self.assertEqual(
+                JsonFormatter().format(logging.makeLogRecord(record.__dict__)),
+                expected,
+            )
+
+
+class LogContextPropagationTests(SimpleTestCase):
+    def test_context_travels_in_task_headers(self):
+        headers = {}
+        with log_context.bound(trace_id="abc", tenant_id=7):
+            celery.attach_log_context(headers=headers)
+        self.assertEqual(headers["log_context"], {"trace_id": "abc", "tenant_id": 7})
+
+        def run_task():
+            task = SimpleNamespace(request=SimpleNamespace(is_eager=False, **headers))
+            celery.restore_log_context(task=task)
+            during = log_context.snapshot()
+            celery.clear_log_context(task=task)
+            return during, log_context.snapshot()
+
+        during, after = copy_context().run(run_task)
+        self.assertEqual(during, {"trace_id": "abc", "tenant_id": 7})
+        self.assertEqual(after, {})
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class CircuitBreakerTests(SimpleTestCase):
+    domain = "api.example.com"
+
+    def setUp(self):
+        cache.clear()
+
+    def _end_open_period(self):
+        # what the open key's TTL does in production
+        cache.delete(circuit_breaker._circuit_key(self.domain))
+
+    def _trip(self):
+        for _ in range(circuit_breaker.FAILURE_THRESHOLD):
+            self.assertFalse(circuit_breaker.on_failure(self.domain))
+        self.assertTrue(circuit_breaker.on_failure(self.domain))
+
+    def test_opens_after_threshold_and_half_opens_when_period_ends(self):
+        self.assertEqual(circuit_breaker.get_state(self.domain), circuit_breaker.CLOSED)
+        self._trip()
+        self.assertEqual(circuit_breaker.get_state(self.domain), circuit_breaker.OPEN)
+        self.assertTrue(circuit_breaker.is_circuit_open(self.domain))
+
+        self._end_open_period()
+        self.assertEqual(
+            circuit_breaker.get_state(self.domain), circuit_breaker.HALF_OPEN
+        )
+        self.assertFalse(circuit_breaker.is_circuit_open(self.domain))
+
+    def test_successful_probes_close_the_circuit(self):
+        self._trip()
+        self._end_open_period()
+
+        for _ in range(circuit_breaker.HALF_OPEN_SUCCESSES):
+            self.assertEqual(
+                circuit_breaker.get_state(self.domain), circuit_breaker.HALF_OPEN
+            )
+            self.assertTrue(circuit_breaker.acquire_probe(self.domain))
+            circuit_breaker.on_success(self.domain, probe=True)
+            circuit_breaker.release_probe(self.domain)
+
+        self.assertEqual(circuit_breaker.get_state(self.domain), circuit_breaker.CLOSED)
+        # the failure window was cleared with it
+        self.assertFalse(circuit_breaker.on_failure(self.domain))
+
+    def test_failed_probe_reopens_with_doubled_period(self):
+        self._trip()
+        self._end_open_period()
+
+        self.assertTrue(circuit_breaker.acquire_probe(self.domain))
+        self.assertTrue(circuit_breaker.on_failure(self.domain, probe=True))
+
+        # second trip, so the open period was 2 * CIRCUIT_OPEN_SECONDS
+        self.assertEqual(cache.get(circuit_breaker._trips_key(self.domain)), 2)
+        self.assertEqual(circuit_breaker.get_state(self.domain), circuit_breaker.OPEN)
+        # re-opening frees the probe slots
+        self._end_open_period()
+        self.assertTrue(circuit_breaker.acquire_probe(self.domain))
+
+    def test_backoff_doubles_up_to_the_cap(self):
+        periods = [circuit_breaker.open_circuit(self.domain) for _ in range(6)]
+        self.assertEqual(periods, [120, 240, 480, 960, 960, 960])
+
+    def test_failure_while_open_does_not_double_backoff(self):
+        self._trip()
+        self.assertTrue(circuit_breaker.on_failure(self.domain))
+        self._end_open_period()
+        self.assertEqual(
+            circuit_breaker.open_circuit(self.domain),
+            circuit_breaker.CIRCUIT_OPEN_SECONDS * 2,
+        )
+
+    def test_probe_slots_are_limited(self):
+        self._trip()
+        self._end_open_period()
+
+        self.assertTrue(circuit_breaker.acquire_probe(self.domain))
+        self.assertFalse(circuit_breaker.acquire_probe(self.domain))
+        circuit_breaker.release_probe(self.domain)
+        self.assertTrue(circuit_breaker.acquire_probe(self.domain))
+
+    def test_concurrent_probes_get_at_most_the_slot_limit(self):
+        self._trip()
+        self._end_open_period()
+        callers = 8
+        barrier = threading.Barrier(callers)
+
+        def probe():
+            barrier.wait()
+            return circuit_breaker.acquire_probe(self.domain)
+
+        with ThreadPoolExecutor(max_workers=callers) as pool:
+            results = list(pool.map(lambda _: probe(), range(callers)))
+
+        self.assertEqual(sum(results), circuit_breaker.HALF_OPEN_MAX_PROBES)
+
+    def test_retried_call_counts_one_failure(self):
+        session = mock.Mock()
+        session.request.return_value = SimpleNamespace(
+            status_code=503, close=lambda: None
+        )
+        url = f"https://{self.domain}/status"
+
+        with mock.patch(
+            "invitations.http_client.get_session", return_value=session
+        ), mock.patch("invitations.http_client.time.sleep"):
+            response = http_client.call_external_service(url=url, retries=2)
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(session.request.call_count, 3)
+        window = circuit_breaker._window_keys(self.domain)
+        self.assertEqual(sum(cache.get_many(window).values()), 1)
+
+
+class MetricsMiddlewareTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(name="Acme")
+
+    def _sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_records_route_status_and_queries(self):
+        route = "api/invitations/<int:invitation_id>/cancel/"
+        labels = {"route": route, "method": "POST", "status": "4xx"}
+        requests = self._sample("http_requests_total", **labels)
+        queries = self._sample("http_request_db_queries_sum", route=route)
+
+        response = self.client.post(
+            "/api/invitations/999/cancel/",
+            headers={"X-Tenant-ID": str(self.tenant.id)},
+        )
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self._sample("http_requests_total", **labels), requests + 1)
+        self.assertGreater(
+            self._sample("http_request_db_queries_sum", route=route), queries
+        )
+        metrics = self.client.get("/metrics")
+        self.assertIn(b"http_request_duration_seconds_bucket", metrics.content)
+
+    def test_response_cache_counters(self):
+        PermissionRule.objects.create(
+            role="viewer", product_id="abc", feature="dashboard", permission="read"
+        )
+        permission_index.invalidate()
+        self.addCleanup(permission_index.invalidate)
+        cache.clear()
+        lookups = "response_cache_lookups_total"
+        misses = self._sample(lookups, endpoint="dashboard", result="miss")
+        hits = self._sample(lookups, endpoint="dashboard", result="hit")
+        saved = self._sample("response_cache_bytes_saved_total", endpoint="dashboard")
+        headers = {"X-Tenant-ID": str(self.tenant.id)}
+
+        first = self.client.get("/api/dashboard/", headers=headers)
+        second = self.client.get(
+            "/api/dashboard/", headers={**headers, "If-None-Match": first["ETag"]}
+        )
+
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(
+            self._sample(lookups, endpoint="dashboard", result="miss"), misses + 1
+        )
+        self.assertEqual(
+            self._sample(lookups, endpoint="dashboard", result="hit"), hits + 1
+        )
+        self.assertEqual(
+            self._sample("response_cache_bytes_saved_total", endpoint="dashboard"),
+            saved + len(first.content),
+        )
+
+    def test_membership_cache_counters(self):
+        cache.clear()
+        lookups = "membership_cache_lookups_total"
+        misses = self._sample(lookups, result="miss")
+        hits = self._sample(lookups, result="hit")
+
+        for _ in range(2):
+            membership_cache.get_role(self.tenant.id, 999)
+
+        self.assertEqual(self._sample(lookups, result="miss"), misses + 1)
+        self.assertEqual(self._sample(lookups, result="hit"), hits + 1)
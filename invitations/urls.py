@@ -1,7 +1,14 @@
 from django.urls import path
+from .async_views import (
+    AsyncDashboardView,
+    AsyncInvitationAcceptView,
+    AsyncInvitationCancelView,
+    AsyncInvitationCreateView,
+)
 from .views import (
     DashboardAPIView,
     InvitationAcceptAPIView,
+    InvitationBulkCreateAPIView,
     InvitationCancelAPIView,
     InvitationCreateAPIView,
 )
@@ -9,7 +16,16 @@ from .views import (
 
 urlpatterns = [
     path("invitations/", InvitationCreateAPIView.as_view()),
+    path("invitations/bulk/", InvitationBulkCreateAPIView.as_view()),
     path("invitations/accept/", InvitationAcceptAPIView.as_view()),
     path("invitations/<int:invitation_id>/cancel/", InvitationCancelAPIView.as_view()),
     path("dashboard/", DashboardAPIView.as_view()),
+    # async stack, for the ASGI entry point
+    path("async/invitations/", AsyncInvitationCreateView.as_view()),
+    path("async/invitations/accept/", AsyncInvitationAcceptView.as_view()),
+    path(
+        "async/invitations/<int:invitation_id>/cancel/",
+        AsyncInvitationCancelView.as_view(),
+    ),
+    path("async/dashboard/", AsyncDashboardView.as_view()),
 ]
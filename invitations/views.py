@@ -1,17 +1,31 @@
 from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from permissions_app.decorators import check_permission
 from invitations.http_client import call_external_service
 
-from .models import Invitation, Tenant
+from . import expiry_scheduler, log_context
+from .bulk import (
+    CREATED,
+    DUPLICATE,
+    INVALID,
+    BulkInviteError,
+    create_bulk_invitations,
+    parse_rows,
+)
+from .idempotency import idempotent
+from .listing import ListingError, list_invitations, page_size, parse_fields
+from .models import Invitation
+from .response_cache import cached_response
 from .serializers import (
     InvitationAcceptSerializer,
     InvitationCreateSerializer,
     InvitationSerializer,
 )
-from .tasks import send_invitation_email
+from .tasks import queue_invitation_email
+from .tenant_context import tenant_error
 
 
 import logging
@@ -20,65 +34,115 @@ logger = logging.getLogger(__name__)
 
 
 class InvitationCreateAPIView(APIView):
-    def post(self, request):
-        tenant_id = request.headers.get("X-Tenant-ID")
-        if not tenant_id:
-            return Response(
-                {"detail": "X-Tenant-ID header missing"},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-
+    def get_permissions(self):
+        # the listing exposes invitee names and emails: authenticated members
+        # only, never the anonymous "viewer" role check_permission falls back to
+        if self.request.method == "GET":
+            return [IsAuthenticated()]
+        return super().get_permissions()
+
+    @check_permission(product_id="abc", feature="invitations", permission="read")
+    def get(self, request):
+        """
+        GET /api/invitations/?status=&cursor=&limit=&fields=id,email,status
+        Newest first; follow `next_cursor` for the next page.
+        """
+        params = request.query_params
         try:
-            tenant = Tenant.objects.get(id=tenant_id)
-        except Tenant.DoesNotExist:
-            return Response(
-                {"detail": "Invalid tenant"}, status=status.HTTP_400_BAD_REQUEST
+            fields = parse_fields(params.get("fields"))
+            results, next_cursor = list_invitations(
+                request.tenant_id,
+                status=params.get("status"),
+                cursor=params.get("cursor"),
+                fields=fields,
+                limit=page_size(params.get("limit")),
             )
+        except ListingError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({"results": results, "next_cursor": next_cursor})
+
+    @idempotent
+    def post(self, request):
+        log_context.bind_user(request.user)
+        error = tenant_error(request)
+        if error is not None:
+            return Response({"detail": error[0]}, status=error[1])
+        tenant = request.tenant
 
         ip = request.META.get("REMOTE_ADDR")
         serializer = InvitationCreateSerializer(
             data=request.data, context={"tenant": tenant, "ip": ip}
         )
         serializer.is_valid(raise_exception=True)
+
+        pending = serializer.pending_invites().first()
+        if pending is not None:
+            return Response(
+                InvitationSerializer(pending).data, status=status.HTTP_200_OK
+            )
+
         invite = serializer.save()
+        expiry_scheduler.schedule([invite])
 
-        send_invitation_email.delay(
+        queue_invitation_email(
             invite.email, invite.name, invite.tenant.name, invite.token
         )
 
-        logger.info(
-            "Invitation created",
-            extra={
-                "trace_id": request.trace_id,
-                "user_id": request.user.id if request.user.is_authenticated else None,
-                "tenant_id": tenant.id,
-            },
-        )
+        logger.info("Invitation created")
 
         return Response(
             InvitationSerializer(invite).data, status=status.HTTP_201_CREATED
         )
 
 
+class InvitationBulkCreateAPIView(APIView):
+    """
+    POST /api/invitations/bulk/
+    Body: [{email, note}, ...] | {"invitations": [...]} | multipart CSV `file`
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    @check_permission(product_id="abc", feature="invitations", permission="write")
+    @idempotent
+    def post(self, request):
+        error = tenant_error(request)
+        if error is not None:
+            return Response({"detail": error[0]}, status=error[1])
+        tenant = request.tenant
+
+        try:
+            rows = parse_rows(request.data, request.FILES)
+        except BulkInviteError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        ip = request.META.get("REMOTE_ADDR")
+        results = create_bulk_invitations(tenant, rows, ip=ip)
+
+        summary = {CREATED: 0, DUPLICATE: 0, INVALID: 0}
+        for result in results:
+            summary[result["status"]] += 1
+
+        logger.info("Bulk invitations created")
+
+        return Response({**summary, "results": results}, status=status.HTTP_201_CREATED)
+
+
 class InvitationAcceptAPIView(APIView):
     """
     POST /api/invitations/accept/
     Body: { token, password }
     """
 
+    @idempotent
     def post(self, request):
         serializer = InvitationAcceptSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         result = serializer.save()
 
-        logger.info(
-            "Invitation accepted",
-            extra={
-                "trace_id": request.trace_id,
-                "user_id": request.user.id,
-                "tenant_id": request.invite.tenant_id,
-            },
-        )
+        log_context.bind(user_id=result["user_id"], tenant_id=result["tenant_id"])
+        logger.info("Invitation accepted")
 
         return Response(
             {"detail": "Invitation accepted", **result}, status=status.HTTP_200_OK
@@ -88,11 +152,21 @@ class InvitationAcceptAPIView(APIView):
 class InvitationCancelAPIView(APIView):
     """
     POST /api/invitations/<id>/cancel/
+    Header: X-Tenant-ID; only the tenant's own invitations can be cancelled.
     """
 
+    @idempotent
     def post(self, request, invitation_id: int):
+        log_context.bind_user(request.user)
+        if request.tenant_error is not None:
+            return Response(
+                {"detail": request.tenant_error[0]}, status=request.tenant_error[1]
+            )
+
         try:
-            invite = Invitation.objects.get(id=invitation_id)
+            invite = Invitation.objects.get(
+                id=invitation_id, tenant_id=request.tenant_id
+            )
         except Invitation.DoesNotExist:
             return Response({"detail": "Not found"}, status=status.HTTP_404_NOT_FOUND)
 
@@ -105,14 +179,7 @@ class InvitationCancelAPIView(APIView):
         invite.status = Invitation.Status.CANCELLED
         invite.save(update_fields=["status", "updated_at"])
 
-        logger.info(
-            "Invitation cancelled",
-            extra={
-                "trace_id": request.trace_id,
-                "user_id": request.user.id if request.user.is_authenticated else None,
-                "tenant_id": invite.tenant_id,
-            },
-        )
+        logger.info("Invitation cancelled")
 
         return Response({"detail": "Invitation cancelled"}, status=status.HTTP_200_OK)
 
@@ -122,15 +189,9 @@ class DashboardAPIView(APIView):
     permission_classes = []
 
     @check_permission(product_id="abc", feature="dashboard", permission="read")
+    @cached_response("dashboard")
     def get(self, request):
-        logger.info(
-            "Dashboard accessed",
-            extra={
-                "trace_id": request.trace_id,
-                "user_id": None,
-                "tenant_id": request.tenant_id,
-            },
-        )
+        logger.info("Dashboard accessed")
 
         return Response(
             {
@@ -1,5 +1,15 @@
 import os
 from celery import Celery
+from celery.signals import (
+    before_task_publish,
+    setup_logging,
+    task_postrun,
+    task_prerun,
+    worker_process_shutdown,
+    worker_shutdown,
+)
+
+from invitations import log_context
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "multi_tenant_system.settings")
 
@@ -7,3 +17,48 @@ app = Celery("multi_tenant_system")
 
 app.config_from_object("django.conf:settings", namespace="CELERY")
 app.autodiscover_tasks()
+
+
+@setup_logging.connect
+def use_django_logging(**kwargs):
+    # keep the LOGGING config (and its log queue) instead of celery's handlers
+    pass
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def flush_log_queue(**kwargs):
+    # prefork children leave through os._exit, which skips atexit
+    from invitations import log_queue
+
+    log_queue.stop()
+
+
+@before_task_publish.connect
+def attach_log_context(headers=None, **kwargs):
+    # carry the caller's trace/tenant/user ids to the worker
+    context = log_context.snapshot()
+    if context and headers is not None:
+        headers.setdefault(log_context.HEADER, context)
+
+
+def _published_context(request) -> dict:
+    context = getattr(request, log_context.HEADER, None)
+    if context is None:
+        context = (getattr(request, "headers", None) or {}).get(log_context.HEADER)
+    return context or {}
+
+
+@task_prerun.connect
+def restore_log_context(task=None, **kwargs):
+    # eager tasks run inline and already share the caller's context
+    if task is None or task.request.is_eager:
+        return
+    log_context.restore(_published_context(task.request))
+
+
+@task_postrun.connect
+def clear_log_context(task=None, **kwargs):
+    if task is None or task.request.is_eager:
+        return
+    log_context.restore({})
@@ -41,6 +41,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "invitations.middleware.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "invitations.middleware.TraceIDMiddleware",
     "invitations.middleware_circuit.ExternalServiceCircuitBreakerMiddleware",
@@ -48,6 +49,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "invitations.middleware.TenantContextMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -114,6 +116,32 @@ AUTH_PASSWORD_VALIDATORS = [
         "NAME": "django.contrib.auth.password_validation.NumericPasswordValidator",
     },
 ]
+
+# Password hashing: PASSWORD_HASHER picks the algorithm for new hashes
+# ("pbkdf2", "scrypt" or "argon2"; argon2 needs argon2-cffi). The others stay
+# listed so existing hashes still verify and are upgraded at the next login.
+PASSWORD_HASHER = os.getenv("PASSWORD_HASHER", "pbkdf2")
+_PASSWORD_HASHERS = {
+    "pbkdf2": "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+    "scrypt": "accounts.hashers.ScryptPasswordHasher",
+    "argon2": "accounts.hashers.Argon2PasswordHasher",
+}
+PASSWORD_HASHERS = [_PASSWORD_HASHERS[PASSWORD_HASHER]] + [
+    path for name, path in _PASSWORD_HASHERS.items() if name != PASSWORD_HASHER
+]
+PASSWORD_SCRYPT_WORK_FACTOR = int(os.getenv("PASSWORD_SCRYPT_WORK_FACTOR", str(2**14)))
+PASSWORD_SCRYPT_BLOCK_SIZE = int(os.getenv("PASSWORD_SCRYPT_BLOCK_SIZE", "8"))
+PASSWORD_SCRYPT_PARALLELISM = int(os.getenv("PASSWORD_SCRYPT_PARALLELISM", "1"))
+PASSWORD_ARGON2_TIME_COST = int(os.getenv("PASSWORD_ARGON2_TIME_COST", "2"))
+PASSWORD_ARGON2_MEMORY_COST = int(os.getenv("PASSWORD_ARGON2_MEMORY_COST", "102400"))
+PASSWORD_ARGON2_PARALLELISM = int(os.getenv("PASSWORD_ARGON2_PARALLELISM", "8"))
+# "pool" hashes in PASSWORD_HASHING_WORKERS processes per web process, with at
+# most PASSWORD_HASHING_MAX_PENDING hashes queued (then 503); "inline" hashes
+# in the request thread.
+PASSWORD_HASHING_STRATEGY = os.getenv("PASSWORD_HASHING_STRATEGY", "pool")
+PASSWORD_HASHING_WORKERS = int(os.getenv("PASSWORD_HASHING_WORKERS", "2"))
+PASSWORD_HASHING_MAX_PENDING = int(os.getenv("PASSWORD_HASHING_MAX_PENDING", "64"))
+
 APP_BASE_URL = os.getenv("APP_BASE_URL", "http://localhost:8000")
 
 # Email configuration
@@ -131,14 +159,125 @@ CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", "redis://redis:6379/1
 CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
 CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler"
+# Deadline-driven expiry tick, and the expire_invitations catch-up sweep that
+# also refills the Redis deadline set; keep the sweep interval shorter than
+# EXPIRY_HORIZON_SECONDS.
+EXPIRY_TICK_SECONDS = int(os.getenv("EXPIRY_TICK_SECONDS", "10"))
+EXPIRY_SWEEP_SECONDS = int(os.getenv("EXPIRY_SWEEP_SECONDS", "3600"))
+CELERY_BEAT_SCHEDULE = {
+    "expire-due-invitations": {
+        "task": "invitations.tasks.expire_due_invitations",
+        "schedule": EXPIRY_TICK_SECONDS,
+        "options": {"expires": EXPIRY_TICK_SECONDS},
+    },
+    "expire-invitations": {
+        "task": "invitations.tasks.expire_invitations",
+        "schedule": EXPIRY_SWEEP_SECONDS,
+        "options": {"expires": EXPIRY_SWEEP_SECONDS},
+    },
+}
 
 # Redis Cache
-CACHES = {
-    "default": {
-        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
-        "LOCATION": "circuit-breaker",
+# Set CACHE_URL (e.g. redis://redis:6379/2) so every web and celery process
+# shares one cache. Without it each process gets its own LocMemCache.
+CACHE_URL = os.getenv("CACHE_URL", "")
+if CACHE_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "circuit-breaker",
+        }
     }
-}
+
+# Permission index: how often (seconds) a process checks the shared version
+# key for PermissionRule changes made by other processes.
+PERMISSION_INDEX_CHECK_SECONDS = int(
+    os.getenv("PERMISSION_INDEX_CHECK_SECONDS", "5")
+)
+
+# Outbound HTTP (invitations.http_client): keep-alive pool size and timeout
+# (seconds) per domain, with optional per-domain overrides,
+# e.g. {"billing.internal:8000": 2}.
+HTTP_CLIENT_POOL_SIZE = int(os.getenv("HTTP_CLIENT_POOL_SIZE", "10"))
+HTTP_CLIENT_TIMEOUT = float(os.getenv("HTTP_CLIENT_TIMEOUT", "5"))
+HTTP_CLIENT_DOMAIN_POOL_SIZES = {}
+HTTP_CLIENT_DOMAIN_TIMEOUTS = {}
+# Threads shared by call_many() fan-out batches in each process.
+HTTP_CLIENT_FANOUT_WORKERS = int(os.getenv("HTTP_CLIENT_FANOUT_WORKERS", "16"))
+# Retries for idempotent calls: full-jitter exponential backoff, and at most
+# HTTP_CLIENT_RETRY_BUDGET_RATIO retries per request per domain (plus a burst
+# of HTTP_CLIENT_RETRY_BUDGET_MIN). Hedged domains get a second attempt once
+# the first has been running longer than the domain's observed p95.
+HTTP_CLIENT_RETRIES = int(os.getenv("HTTP_CLIENT_RETRIES", "2"))
+HTTP_CLIENT_RETRY_BACKOFF = float(os.getenv("HTTP_CLIENT_RETRY_BACKOFF", "0.1"))
+HTTP_CLIENT_RETRY_BACKOFF_MAX = float(os.getenv("HTTP_CLIENT_RETRY_BACKOFF_MAX", "2"))
+HTTP_CLIENT_RETRY_BUDGET_RATIO = float(
+    os.getenv("HTTP_CLIENT_RETRY_BUDGET_RATIO", "0.1")
+)
+HTTP_CLIENT_RETRY_BUDGET_MIN = int(os.getenv("HTTP_CLIENT_RETRY_BUDGET_MIN", "10"))
+HTTP_CLIENT_HEDGE_DOMAINS = [
+    d for d in os.getenv("HTTP_CLIENT_HEDGE_DOMAINS", "").split(",") if d
+]
+HTTP_CLIENT_HEDGE_WORKERS = int(os.getenv("HTTP_CLIENT_HEDGE_WORKERS", "16"))
+
+# Bulk invitations: max rows per request, rows per INSERT / dedupe query,
+# and invites per email task message.
+BULK_INVITE_MAX_ROWS = int(os.getenv("BULK_INVITE_MAX_ROWS", "20000"))
+BULK_INVITE_CHUNK_SIZE = int(os.getenv("BULK_INVITE_CHUNK_SIZE", "1000"))
+INVITE_EMAIL_BATCH_SIZE = int(os.getenv("INVITE_EMAIL_BATCH_SIZE", "100"))
+# Invitation email delivery: single invites created within this window are
+# sent together over one SMTP connection (needs CACHE_URL; 0 disables), sends
+# are paced to at most this many per second per task (0 = unpaced), and
+# failed messages are retried this many times.
+INVITE_EMAIL_BATCH_WINDOW_SECONDS = int(
+    os.getenv("INVITE_EMAIL_BATCH_WINDOW_SECONDS", "2")
+)
+INVITE_EMAIL_RATE_PER_SECOND = float(os.getenv("INVITE_EMAIL_RATE_PER_SECOND", "0"))
+INVITE_EMAIL_MAX_RETRIES = int(os.getenv("INVITE_EMAIL_MAX_RETRIES", "3"))
+
+# expire_invitations sweep: rows per UPDATE and pause (seconds) between chunks.
+EXPIRE_INVITATIONS_CHUNK_SIZE = int(os.getenv("EXPIRE_INVITATIONS_CHUNK_SIZE", "1000"))
+EXPIRE_INVITATIONS_SLEEP_SECONDS = float(
+    os.getenv("EXPIRE_INVITATIONS_SLEEP_SECONDS", "0.05")
+)
+
+# Deadlines of pending invitations expiring within this many seconds are kept
+# in the Redis deadline set; keep it longer than the catch-up sweep interval.
+EXPIRY_HORIZON_SECONDS = int(os.getenv("EXPIRY_HORIZON_SECONDS", str(2 * 3600)))
+
+# Idempotency-Key on mutating invitation endpoints: how long (seconds) a
+# response is replayed for, how long the in-flight lock lives, and how long a
+# concurrent duplicate waits for the first request before getting a 409.
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", str(24 * 3600)))
+IDEMPOTENCY_LOCK_SECONDS = int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "30"))
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "10"))
+
+# GET /api/invitations/: default and maximum `limit` per page.
+INVITATION_LIST_PAGE_SIZE = int(os.getenv("INVITATION_LIST_PAGE_SIZE", "50"))
+INVITATION_LIST_MAX_PAGE_SIZE = int(os.getenv("INVITATION_LIST_MAX_PAGE_SIZE", "200"))
+
+# Tenant membership cache TTL (seconds); negative results are cached too.
+MEMBERSHIP_CACHE_TTL = int(os.getenv("MEMBERSHIP_CACHE_TTL", "300"))
+
+# Tenant objects resolved by TenantContextMiddleware are cached this long
+# (seconds); saving or deleting a tenant drops its entry.
+TENANT_CACHE_TTL = int(os.getenv("TENANT_CACHE_TTL", "300"))
+
+# Cached per-tenant/role read responses (invitations.response_cache), in
+# seconds; membership and permission rule changes invalidate them earlier.
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "300"))
+
+# Request, DB and outbound metrics served at /metrics (invitations.metrics).
+# With several worker processes also set PROMETHEUS_MULTIPROC_DIR (read by
+# prometheus_client) so /metrics sums every worker.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
 
 
 # Internationalization
@@ -208,6 +347,13 @@ import os
 
 SERVICE_NAME = os.getenv("SERVICE_NAME", "unknown-service")
 
+# The root handlers below are moved behind a bounded queue written by a
+# background thread (invitations.log_queue). When it is full, records at or
+# below LOG_QUEUE_DROP_LEVEL are dropped first; ERROR is never dropped.
+LOG_QUEUE_ENABLED = os.getenv("LOG_QUEUE_ENABLED", "1") == "1"
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_QUEUE_DROP_LEVEL = os.getenv("LOG_QUEUE_DROP_LEVEL", "INFO")
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
@@ -217,12 +363,11 @@ LOGGING = {
         },
     },
     "formatters": {
+        # same output as pythonjsonlogger's JsonFormatter with the format
+        # "%(asctime)s %(levelname)s %(name)s %(message)s %(service)s
+        # %(trace_id)s %(user_id)s %(tenant_id)s", at a fraction of the cost
         "json": {
-            "()": "pythonjsonlogger.jsonlogger.JsonFormatter",
-            "format": (
-                "%(asctime)s %(levelname)s %(name)s %(message)s "
-                "%(service)s %(trace_id)s %(user_id)s %(tenant_id)s"
-            ),
+            "()": "invitations.log_format.JsonFormatter",
         },
     },
     "handlers": {
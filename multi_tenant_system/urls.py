@@ -18,7 +18,11 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from invitations.metrics import metrics_view
+
 urlpatterns = [
+    path("metrics", metrics_view),
     path("admin/", admin.site.urls),
     path("api/", include("invitations.urls")),
+    path("api/permissions/", include("permissions_app.urls")),
 ]
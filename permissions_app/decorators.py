@@ -1,53 +1,82 @@
 from functools import wraps
+from django.http import JsonResponse
 from rest_framework.response import Response
 from rest_framework import status
 
-from invitations.models import TenantMember
-from permissions_app.models import PermissionRule
+from invitations import log_context, membership_cache
+from permissions_app.permission_index import ais_allowed, is_allowed, register
+
+NOT_A_MEMBER = ("User not part of this tenant", status.HTTP_403_FORBIDDEN)
+PERMISSION_DENIED = ("Permission denied", status.HTTP_403_FORBIDDEN)
+
+
+def resolve_tenant_role(request):
+    """
+    Return (tenant_id, role, None) for the X-Tenant-ID tenant, or
+    (None, None, error_response) when the caller cannot act in it.
+    """
+    # parsed once by TenantContextMiddleware
+    tenant_id, error = request.tenant_id, request.tenant_error
+    if error is not None:
+        return None, None, Response({"detail": error[0]}, status=error[1])
+
+    if not request.user.is_authenticated:
+        return tenant_id, "viewer", None
+
+    if not request.membership:
+        return None, None, Response({"detail": NOT_A_MEMBER[0]}, status=NOT_A_MEMBER[1])
+    log_context.bind_user(request.user)
+    return tenant_id, str(request.membership), None
+
+
+async def aresolve_tenant_role(request, anonymous: bool = False):
+    """
+    Async variant of resolve_tenant_role for plain Django async views;
+    errors are returned as JsonResponse. With anonymous=True the session is
+    not consulted and the caller gets the anonymous role.
+    """
+    tenant_id, error = request.tenant_id, request.tenant_error
+    if error is not None:
+        return None, None, JsonResponse({"detail": error[0]}, status=error[1])
+
+    if anonymous:
+        return tenant_id, "viewer", None
+
+    user = await request.auser()
+    if not user.is_authenticated:
+        return tenant_id, "viewer", None
+
+    role = await membership_cache.aget_role(tenant_id, user.id)
+    if role is None:
+        return (
+            None,
+            None,
+            JsonResponse({"detail": NOT_A_MEMBER[0]}, status=NOT_A_MEMBER[1]),
+        )
+    log_context.bind_user(user)
+    return tenant_id, role, None
 
 
 def check_permission(product_id: str, feature: str, permission: str):
+    register(product_id, feature, permission)
+
     def decorator(view_method):
         @wraps(view_method)
         def _wrapped(self, request, *args, **kwargs):
-            tenant_id = request.headers.get("X-Tenant-ID")
-            if not tenant_id:
-                return Response(
-                    {"detail": "X-Tenant-ID header missing"},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-            if request.user.is_authenticated:
-                try:
-                    membership = TenantMember.objects.get(
-                        tenant_id=tenant_id,
-                        user=request.user,
-                    )
-                    role = membership.role
-                except TenantMember.DoesNotExist:
-                    return Response(
-                        {"detail": "User not part of this tenant"},
-                        status=status.HTTP_403_FORBIDDEN,
-                    )
-                user_id = request.user.id
-            else:
-                role = "viewer"
-                user_id = None
-
-            allowed = PermissionRule.objects.filter(
-                role=role,
-                product_id=product_id,
-                feature=feature,
-                permission=permission,
-            ).exists()
+            tenant_id, role, error = resolve_tenant_role(request)
+            if error is not None:
+                return error
+
+            allowed = is_allowed(role, product_id, feature, permission)
 
             if not allowed:
                 return Response(
-                    {"detail": "Permission denied"},
-                    status=status.HTTP_403_FORBIDDEN,
+                    {"detail": PERMISSION_DENIED[0]},
+                    status=PERMISSION_DENIED[1],
                 )
 
             # attach context for downstream use & logging
-            request.tenant_id = int(tenant_id)
+            request.tenant_id = tenant_id
             request.role = role
 
             return view_method(self, request, *args, **kwargs)
@@ -55,3 +84,37 @@ def check_permission(product_id: str, feature: str, permission: str):
         return _wrapped
 
     return decorator
+
+
+def acheck_permission(
+    product_id: str, feature: str, permission: str, anonymous: bool = False
+):
+    """
+    check_permission for `async def` methods on plain Django views.
+
+    Pass anonymous=True for the counterpart of a DRF view with
+    `authentication_classes = []`, which never sees the logged-in user.
+    """
+    register(product_id, feature, permission)
+
+    def decorator(view_method):
+        @wraps(view_method)
+        async def _wrapped(self, request, *args, **kwargs):
+            tenant_id, role, error = await aresolve_tenant_role(request, anonymous)
+            if error is not None:
+                return error
+
+            if not await ais_allowed(role, product_id, feature, permission):
+                return JsonResponse(
+                    {"detail": PERMISSION_DENIED[0]},
+                    status=PERMISSION_DENIED[1],
+                )
+
+            request.tenant_id = tenant_id
+            request.role = role
+
+            return await view_method(self, request, *args, **kwargs)
+
+        return _wrapped
+
+    return decorator
@@ -0,0 +1,48 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+from django.urls import get_resolver
+
+from permissions_app import permission_index
+
+
+def _deep_size(obj, seen=None) -> int:
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_size(k, seen) + _deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(_deep_size(item, seen) for item in obj)
+    elif hasattr(obj, "__slots__"):
+        size += sum(_deep_size(getattr(obj, name), seen) for name in obj.__slots__)
+    return size
+
+
+class Command(BaseCommand):
+    help = "Compile the permission index and report build time and memory use."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        # check_permission registers its triples when the views are
+        # imported, which a management command otherwise never does
+        get_resolver().url_patterns
+        rules = permission_index.load_rules()
+
+        timings = []
+        for _ in range(options["repeat"]):
+            started = time.perf_counter()
+            index = permission_index.build_index(rules)
+            timings.append(time.perf_counter() - started)
+
+        self.stdout.write(f"rules:         {len(rules)}")
+        self.stdout.write(f"catalog:       {len(index.catalog)} triples")
+        self.stdout.write(f"roles:         {len(index.role_bits)}")
+        self.stdout.write(f"compile (min): {min(timings) * 1000:.2f} ms")
+        self.stdout.write(f"compile (max): {max(timings) * 1000:.2f} ms")
+        self.stdout.write(f"index memory:  {_deep_size(index)} bytes")
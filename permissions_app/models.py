@@ -2,6 +2,9 @@ from django.db import models
 
 
 class PermissionRule(models.Model):
+    # Matches any value in role, product_id, feature or permission
+    WILDCARD = "*"
+
     role = models.CharField(max_length=50)
     product_id = models.CharField(max_length=50)
     feature = models.CharField(max_length=50)
@@ -0,0 +1,265 @@
+import sys
+import threading
+import time
+from itertools import product
+
+from django.conf import settings
+from django.core.cache import cache
+
+from invitations.models import TenantMember
+from permissions_app.models import PermissionRule
+
+INDEX_VERSION_KEY = "permissions:index_version"
+
+WILDCARD = PermissionRule.WILDCARD
+
+# Highest role first, as declared on TenantMember.Role. Each role inherits
+# every rule granted to the roles after it.
+ROLE_ORDER = list(TenantMember.Role.values)
+
+_lock = threading.Lock()
+_state = {
+    "index": None,
+    "version": None,
+    "checked_at": 0.0,
+}
+
+# (product_id, feature, permission) triples guarded by check_permission.
+# They are interned into the catalog even if only wildcard rules grant them.
+_registered = set()
+
+
+class CompiledIndex:
+    """
+    Per-role bitsets over an interned (product_id, feature, permission)
+    catalog. A check against a catalogued triple is one dict lookup plus one
+    bit test; other triples fall back to matching the role's wildcard grants.
+    """
+
+    __slots__ = (
+        "catalog",
+        "triples",
+        "role_bits",
+        "role_grants",
+        "default_bits",
+        "default_grants",
+    )
+
+    def __init__(self, catalog, role_bits, role_grants, default_bits, default_grants):
+        self.catalog = catalog
+        self.triples = sorted(catalog, key=catalog.__getitem__)
+        self.role_bits = role_bits
+        self.role_grants = role_grants
+        # used for roles with no rules of their own; "*" role rules are
+        # already folded into every other role
+        self.default_bits = default_bits
+        self.default_grants = default_grants
+
+    def allows(self, role: str, triple: tuple) -> bool:
+        bit = self.catalog.get(triple)
+        if bit is not None:
+            return (self.role_bits.get(role, self.default_bits) >> bit) & 1 == 1
+        grants = self.role_grants.get(role, self.default_grants)
+        return any(pattern in grants for pattern in _generalizations(triple))
+
+    def granted(self, role: str) -> list:
+        bits = self.role_bits.get(role, self.default_bits)
+        concrete = [t for i, t in enumerate(self.triples) if (bits >> i) & 1]
+        grants = self.role_grants.get(role, self.default_grants)
+        return sorted(concrete + [g for g in grants if WILDCARD in g])
+
+
+def _generalizations(triple: tuple):
+    """
+    The triple itself plus every variant with one or more fields replaced
+    by the wildcard (8 patterns in total).
+    """
+    return product(*((value, WILDCARD) for value in triple))
+
+
+def compile_index(rules, extra_triples=()) -> CompiledIndex:
+    """
+    Compile (role, product_id, feature, permission) rows into a CompiledIndex.
+    """
+    intern = sys.intern
+    direct = {}
+    for role, *triple in rules:
+        direct.setdefault(intern(role), set()).add(tuple(intern(v) for v in triple))
+
+    default_grants = frozenset(direct.pop(WILDCARD, ()))
+
+    # inherit along ROLE_ORDER, lowest role first
+    role_grants = {}
+    inherited = set(default_grants)
+    for role in reversed(ROLE_ORDER):
+        inherited |= direct.get(role, set())
+        role_grants[role] = frozenset(inherited)
+    for role, grants in direct.items():
+        if role not in role_grants:
+            role_grants[role] = frozenset(grants | default_grants)
+
+    concrete = {
+        triple
+        for grants in direct.values()
+        for triple in grants
+        if WILDCARD not in triple
+    }
+    concrete |= {t for t in default_grants if WILDCARD not in t}
+    concrete |= set(extra_triples)
+    catalog = {triple: bit for bit, triple in enumerate(sorted(concrete))}
+
+    def to_bits(grants):
+        bits = 0
+        for triple, bit in catalog.items():
+            if any(pattern in grants for pattern in _generalizations(triple)):
+                bits |= 1 << bit
+        return bits
+
+    role_bits = {role: to_bits(grants) for role, grants in role_grants.items()}
+
+    return CompiledIndex(
+        catalog, role_bits, role_grants, to_bits(default_grants), default_grants
+    )
+
+
+def build_index(rules) -> CompiledIndex:
+    """
+    Compile rules together with every triple registered by check_permission.
+    """
+    return compile_index(rules, _registered)
+
+
+def _check_interval() -> float:
+    return getattr(settings, "PERMISSION_INDEX_CHECK_SECONDS", 5)
+
+
+def _shared_version():
+    version = cache.get(INDEX_VERSION_KEY)
+    if version is None:
+        cache.add(INDEX_VERSION_KEY, 1, timeout=None)
+        version = cache.get(INDEX_VERSION_KEY, 1)
+    return version
+
+
+def load_rules() -> list:
+    return list(
+        PermissionRule.objects.values_list(
+            "role", "product_id", "feature", "permission"
+        )
+    )
+
+
+def get_index() -> CompiledIndex:
+    """
+    Return the compiled index for this process.
+
+    Compiled lazily on first use. The shared version key is consulted at most
+    once per PERMISSION_INDEX_CHECK_SECONDS, so a change made by any process
+    is picked up by every other process within that interval.
+    """
+    now = time.monotonic()
+    index = _state["index"]
+    if index is not None and now - _state["checked_at"] < _check_interval():
+        return index
+
+    with _lock:
+        if (
+            _state["index"] is not None
+            and now - _state["checked_at"] < _check_interval()
+        ):
+            return _state["index"]
+
+        version = _shared_version()
+        if _state["index"] is None or version != _state["version"]:
+            _state["index"] = build_index(load_rules())
+            _state["version"] = version
+        _state["checked_at"] = now
+        return _state["index"]
+
+
+async def _ashared_version():
+    version = await cache.aget(INDEX_VERSION_KEY)
+    if version is None:
+        await cache.aadd(INDEX_VERSION_KEY, 1, timeout=None)
+        version = await cache.aget(INDEX_VERSION_KEY, 1)
+    return version
+
+
+async def aget_index() -> CompiledIndex:
+    """
+    Async variant of get_index; the version check and reload use the async
+    cache and ORM APIs so the event loop is never handed to a thread.
+    """
+    now = time.monotonic()
+    index = _state["index"]
+    if index is not None and now - _state["checked_at"] < _check_interval():
+        return index
+
+    version = await _ashared_version()
+    if index is None or version != _state["version"]:
+        rules = [
+            rule
+            async for rule in PermissionRule.objects.values_list(
+                "role", "product_id", "feature", "permission"
+            )
+        ]
+        index = build_index(rules)
+        with _lock:
+            _state["index"] = index
+            _state["version"] = version
+    _state["checked_at"] = now
+    return index
+
+
+async def ais_allowed(role: str, product_id: str, feature: str, permission: str):
+    return (await aget_index()).allows(role, (product_id, feature, permission))
+
+
+def register(product_id: str, feature: str, permission: str):
+    """
+    Add a triple to the catalog so checks against it are a single bit test.
+    """
+    triple = (product_id, feature, permission)
+    if triple in _registered:
+        return
+    with _lock:
+        _registered.add(triple)
+        _state["index"] = None
+
+
+def is_allowed(role: str, product_id: str, feature: str, permission: str) -> bool:
+    return get_index().allows(role, (product_id, feature, permission))
+
+
+def has_permissions(role: str, checks) -> dict:
+    """
+    Resolve many (product_id, feature, permission) tuples for one role
+    against a single snapshot of the index.
+
+    Returns {tuple: bool} in the order the tuples were given.
+    """
+    index = get_index()
+    return {tuple(check): index.allows(role, tuple(check)) for check in checks}
+
+
+def effective_permissions(role: str) -> list:
+    """
+    Every (product_id, feature, permission) granted to the role, sorted.
+    Wildcard grants are listed as-is, with "*" in the matching fields.
+    """
+    return get_index().granted(role)
+
+
+def invalidate():
+    """
+    Bump the shared version and drop the local copy so the next check reloads.
+    """
+    try:
+        cache.incr(INDEX_VERSION_KEY)
+    except ValueError:
+        cache.set(INDEX_VERSION_KEY, 2, timeout=None)
+
+    with _lock:
+        _state["index"] = None
+        _state["version"] = None
+        _state["checked_at"] = 0.0
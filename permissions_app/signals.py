@@ -0,0 +1,14 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from permissions_app import permission_index
+from permissions_app.models import PermissionRule
+
+
+@receiver(post_save, sender=PermissionRule)
+@receiver(post_delete, sender=PermissionRule)
+def rebuild_permission_index(sender, **kwargs):
+    # queryset.update() / bulk_create() bypass signals; call
+    # permission_index.invalidate() explicitly after those.
+    transaction.on_commit(permission_index.invalidate)
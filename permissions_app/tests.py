@@ -1,3 +1,68 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from permissions_app import permission_index
+from permissions_app.models import PermissionRule
+from permissions_app.permission_index import INDEX_VERSION_KEY, compile_index
+
+
+class CompiledIndexTests(SimpleTestCase):
+    def test_wildcard_rules(self):
+        index = compile_index(
+            [("*", "abc", "*", "read"), ("staff", "*", "reports", "*")],
+            extra_triples=[("abc", "dashboard", "read")],
+        )
+
+        # catalogued triple, granted through the "*" role to everyone
+        self.assertTrue(index.allows("viewer", ("abc", "dashboard", "read")))
+        self.assertTrue(index.allows("unknown", ("abc", "dashboard", "read")))
+        # not catalogued, matched against the wildcard grants
+        self.assertTrue(index.allows("viewer", ("abc", "invitations", "read")))
+        self.assertTrue(index.allows("staff", ("xyz", "reports", "export")))
+        self.assertFalse(index.allows("viewer", ("abc", "invitations", "write")))
+        self.assertFalse(index.allows("viewer", ("xyz", "reports", "export")))
+
+    def test_roles_inherit_lower_roles(self):
+        index = compile_index(
+            [
+                ("viewer", "abc", "invitations", "read"),
+                ("admin", "abc", "invitations", "write"),
+            ]
+        )
+        read = ("abc", "invitations", "read")
+        write = ("abc", "invitations", "write")
+
+        for role in ("owner", "admin", "staff", "viewer"):
+            self.assertTrue(index.allows(role, read), role)
+        self.assertTrue(index.allows("owner", write))
+        self.assertTrue(index.allows("admin", write))
+        self.assertFalse(index.allows("staff", write))
+        self.assertFalse(index.allows("viewer", write))
+
+
+class PermissionIndexVersionTests(TestCase):
+    def setUp(self):
+        permission_index.invalidate()
+        self.addCleanup(permission_index.invalidate)
+
+    def test_version_bump_reloads_index(self):
+        rule = PermissionRule.objects.create(
+            role="viewer", product_id="abc", feature="reports", permission="read"
+        )
+        self.assertTrue(permission_index.is_allowed("viewer", "abc", "reports", "read"))
+
+        # update() sends no signal; the compiled copy is still served
+        PermissionRule.objects.filter(pk=rule.pk).update(permission="write")
+        self.assertTrue(permission_index.is_allowed("viewer", "abc", "reports", "read"))
+
+        # another process bumping the shared version is picked up at the
+        # next check
+        cache.incr(INDEX_VERSION_KEY)
+        with override_settings(PERMISSION_INDEX_CHECK_SECONDS=0):
+            self.assertFalse(
+                permission_index.is_allowed("viewer", "abc", "reports", "read")
+            )
+            self.assertTrue(
+                permission_index.is_allowed("viewer", "abc", "reports", "write")
+            )
 
-# Create your tests here.
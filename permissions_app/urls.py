@@ -0,0 +1,7 @@
+from django.urls import path
+from .views import EffectivePermissionsAPIView
+
+
+urlpatterns = [
+    path("effective/", EffectivePermissionsAPIView.as_view()),
+]
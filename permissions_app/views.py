@@ -0,0 +1,40 @@
+import hashlib
+import json
+
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from permissions_app.decorators import resolve_tenant_role
+from permissions_app.permission_index import effective_permissions
+
+
+class EffectivePermissionsAPIView(APIView):
+    """
+    GET /api/permissions/effective/
+    Header: X-Tenant-ID
+    Returns every permission the caller holds in the tenant. Supports
+    If-None-Match, answering 304 when the set is unchanged.
+    """
+
+    def get(self, request):
+        tenant_id, role, error = resolve_tenant_role(request)
+        if error is not None:
+            return error
+
+        payload = {
+            "tenant_id": tenant_id,
+            "role": role,
+            "permissions": [
+                {"product_id": product_id, "feature": feature, "permission": perm}
+                for product_id, feature, perm in effective_permissions(role)
+            ],
+        }
+        body = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+        etag = f'"{hashlib.sha256(body.encode()).hexdigest()[:32]}"'
+
+        if_none_match = request.headers.get("If-None-Match", "")
+        if etag in [tag.strip() for tag in if_none_match.split(",")]:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+        return Response(payload, headers={"ETag": etag})